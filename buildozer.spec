@@ -5,19 +5,22 @@ package.domain = org.zahirov
 source.dir = .
 source.include_exts = py,png,jpg,kv,atlas,json,xml
 source.exclude_exts = spec,bak
-source.exclude_dirs = venv,bin,downloads,temp_preview,__pycache__,.buildozer,.git,.venv
-source.exclude_patterns = *.pyc,*.pyo,*.bak,main.py.bak,requirements.txt,download_history.json
+source.exclude_dirs = venv,bin,downloads,temp_preview,info_cache,__pycache__,.buildozer,.git,.venv
+source.exclude_patterns = *.pyc,*.pyo,*.bak,main.py.bak,requirements.txt,download_history.json,download_history.db*,download_index.json,metrics.jsonl*,job_journal.json,redirect_cache.json,service_token
 version = 1.0.3
 
 # Minimal dependencies — no plyer, no tiktok-downloader
-requirements = python3,kivy==2.3.0,kivymd==1.2.0,requests,yt-dlp,certifi,urllib3,charset-normalizer,idna
+requirements = python3,sqlite3,kivy==2.3.0,kivymd==1.2.0,requests,yt-dlp,certifi,urllib3,charset-normalizer,idna
 
 icon.filename = %(source.dir)s/icon.png
 
+# Downloads run here so they survive the activity being backgrounded
+services = Downloader:service.py:foreground
+
 orientation = portrait
 fullscreen = 0
 
-android.permissions = INTERNET,WRITE_EXTERNAL_STORAGE,READ_EXTERNAL_STORAGE
+android.permissions = INTERNET,WRITE_EXTERNAL_STORAGE,READ_EXTERNAL_STORAGE,FOREGROUND_SERVICE,POST_NOTIFICATIONS,WAKE_LOCK
 android.manifest.intent_filters = intent_filters.xml
 android.api = 33
 android.minapi = 24
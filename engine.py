@@ -0,0 +1,3310 @@
+"""
+=======================================================
+  PRO DOWNLOADER — download engine
+  UI-independent core shared by the Kivy app and the
+  headless batch mode (`python main.py --batch`).
+
+"""
+
+import os
+import sys
+import copy
+import json
+import hashlib
+import argparse
+import threading
+import time
+import re
+import queue
+import sqlite3
+import shutil
+import socket
+import secrets
+import subprocess
+import itertools
+import statistics
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache, partial
+from http.cookies import SimpleCookie
+from typing import TYPE_CHECKING, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from datetime import datetime
+
+# NOTE: `requests` and `yt_dlp` are imported lazily inside the functions
+# that use them — yt-dlp alone registers hundreds of extractors, and the
+# UI should not wait for that before its first frame. See warm_up().
+if TYPE_CHECKING:
+    import requests
+
+# ─────────────────────────────────────────────
+#  CONSTANTS
+# ─────────────────────────────────────────────
+APP_VERSION  = "1.0.3"
+HISTORY_DB   = "download_history.db"
+HISTORY_FILE = "download_history.json"   # legacy store, imported once
+CHUNK_SIZE   = 131072  # 128 KB – starting read size for manual downloads
+
+# Adaptive reads for manual downloads: the read size follows throughput
+CHUNK_MIN         = 16 * 1024          # floor on slow / throttled links
+CHUNK_MAX         = 2 * 1024 * 1024    # ceiling on fast LAN / CDN links
+CHUNK_TARGET_TIME = 0.25               # aim for about one read per 250 ms
+WRITE_BUFFER_SIZE = 1024 * 1024        # file buffer for single-stream writes
+FSYNC_EVERY       = 0                  # fsync after this many bytes (0 = never)
+
+# Segmented (multi-connection) manual downloads
+SEGMENT_COUNT    = 4                  # parallel byte ranges per file
+MIN_SEGMENT_SIZE = 2 * 1024 * 1024    # don't split below 2 MB per range
+
+MAX_CONCURRENT_DOWNLOADS = 3   # worker pool size (parallel yt-dlp sessions)
+
+HISTORY_RETENTION   = 5000   # newest history records kept (0 = keep all)
+HISTORY_PRUNE_EVERY = 100    # inserts between retention sweeps
+
+PROGRESS_FLUSH_HZ = 10   # max UI / CLI progress refreshes per second
+
+# Job priorities — lower runs first, FIFO within the same priority
+PRIORITY_HIGH   = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW    = 10
+
+# Job states
+JOB_QUEUED    = "queued"
+JOB_RUNNING   = "running"
+JOB_DONE      = "done"
+JOB_FAILED    = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_PAUSED    = "paused"      # keeps its partial data; resume() re-queues it
+
+IS_ANDROID = "ANDROID_ARGUMENT" in os.environ   # same check Kivy uses
+
+# Shared browser-like User-Agent (works on phone AND headless server)
+USER_AGENT = (
+    "Mozilla/5.0 (Linux; Android 13; Pixel 7) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Mobile Safari/537.36"
+)
+
+# Default headers for every request (shared session AND yt-dlp)
+HTTP_HEADERS = {
+    "User-Agent":      USER_AGENT,
+    "Accept-Language": "en-US,en;q=0.9",
+}
+HTTP_POOL_SIZE = MAX_CONCURRENT_DOWNLOADS * SEGMENT_COUNT   # one socket per range
+HTTP_RETRIES   = 3
+
+# yt-dlp info-dict cache (skips extraction on re-downloads / retries)
+INFO_CACHE_DIR     = "info_cache"
+INFO_CACHE_TTL     = 3 * 3600   # signed media URLs usually live ~6 h
+INFO_CACHE_MAX     = 200        # entries kept (least recently used evicted)
+INFO_EXPIRY_MARGIN = 300        # drop entries 5 min before their URLs expire
+
+# Short-link expansion cache (vm.tiktok.com/… → full video URL)
+REDIRECT_CACHE_FILE = "redirect_cache.json"
+REDIRECT_CACHE_TTL  = 7 * 86400   # short links are permanent; re-check weekly
+REDIRECT_CACHE_MAX  = 500         # entries kept (least recently used evicted)
+REDIRECT_TIMEOUT    = 15
+
+# Local index of finished downloads: (platform, video id, quality) → file, kept in HISTORY_DB
+DEDUP_VERIFY_HASH   = False             # re-hash before reusing (catches corruption)
+HASH_BLOCK_SIZE     = 1024 * 1024
+
+# Per-job download metrics (JSON lines, rotated by size)
+METRICS_FILE      = "metrics.jsonl"
+METRICS_MAX_BYTES = 1024 * 1024   # rotate at 1 MB
+METRICS_BACKUPS   = 3             # metrics.jsonl.1 … .3 kept
+PEAK_WINDOW       = 1.0           # seconds per peak-throughput sample
+
+# Unfinished jobs survive process death (resumed on next start)
+JOB_JOURNAL_FILE      = "job_journal.json"
+JOURNAL_SAVE_INTERVAL = 1.0   # s between progress-only journal writes
+JOURNAL_MAX_RESUMES   = 3     # drop a job that keeps dying on resume
+
+# Format selection policy: "best", "<N>p" (max height), "<size>" such as
+# "50M" (max file size) or "<N>s" (finish in N s at measured throughput)
+DEFAULT_QUALITY      = "best"
+QUALITY_PRESETS      = ("best", "720p", "480p", "50M", "60s")   # UI toggle order
+THROUGHPUT_SAMPLES   = 20                # recent jobs per platform in the estimate
+THROUGHPUT_MIN_BYTES = 1024 * 1024       # smaller transfers say little about speed
+
+# Desktop high-quality path: separate DASH video + audio, remuxed by ffmpeg
+FFMPEG_MERGE         = True   # use it whenever an ffmpeg binary is found
+FRAGMENT_CONCURRENCY = 4      # parallel DASH/HLS fragments per stream
+FFMPEG_TIMEOUT       = 600    # s; stream copy is I/O bound, this is a hang guard
+
+# Bandwidth scheduler (bytes/s, 0 = unlimited)
+BANDWIDTH_GLOBAL_LIMIT = 0
+BANDWIDTH_JOB_LIMIT    = 0
+BANDWIDTH_BURST        = 0.5   # seconds of rate a job may bank
+PRIORITY_WEIGHTS = {PRIORITY_HIGH: 4, PRIORITY_NORMAL: 2, PRIORITY_LOW: 1}
+SHORT_CLIP_BYTES = 32 * 1024 * 1024   # smaller files get SHORT_CLIP_BOOST × share
+SHORT_CLIP_BOOST = 4
+
+# Playlists / channels / profiles
+COLLECTION_MAX_ENTRIES = 1000   # entries listed per collection URL
+
+# Extractor chains: fastest healthy engine first, the rest as fallbacks
+EXTRACTOR_WINDOW      = 20     # recent attempts kept per (platform, engine)
+EXTRACTOR_MIN_SAMPLES = 3      # successes needed before latency reorders a chain
+EXTRACTOR_MIN_SUCCESS = 0.5    # below this success rate an engine is demoted…
+EXTRACTOR_COOLDOWN    = 600    # …until its last failure is this old (s)
+TIKTOK_API_SERVICE    = "tikwm"   # tiktok-downloader service for the fast path
+
+# Warm yt-dlp instances (extractors, player JS / signature caches) reused across jobs
+YDL_POOL_MAX_USES = 25                         # leases before an instance is rebuilt
+YDL_POOL_MAX_AGE  = 1800                       # s; cookies and player JS go stale
+YDL_POOL_IDLE     = MAX_CONCURRENT_DOWNLOADS   # idle instances kept per platform
+YDL_JOB_OPTIONS   = ("format", "outtmpl", "logger", "progress_hooks", "ratelimit")
+
+# Android download service (service.py) ↔ UI: JSON lines over a localhost socket
+SERVICE_NAME       = "Downloader"      # buildozer `services` entry → ServiceDownloader
+SERVICE_PORT       = 0                 # 0 → any free port, published in SERVICE_TOKEN_FILE
+SERVICE_TOKEN_FILE = "service_token"   # "<port> <token>"; app-private, other apps can't read it
+SERVICE_RETRY      = 1.0               # s between client reconnect attempts
+
+# ─────────────────────────────────────────────
+#  LOGGER
+# ─────────────────────────────────────────────
+_log_stream = None   # None → stdout; batch mode moves logs to stderr
+
+
+def log(msg: str, level: str = "INFO"):
+    ts  = datetime.now().strftime("%H:%M:%S")
+    tag = {"INFO": "ℹ", "OK": "✓", "WARN": "⚠", "ERR": "✗"}.get(level, "•")
+    print(f"[{ts}] {tag}  {msg}", file=_log_stream)
+
+
+def set_log_stream(stream):
+    global _log_stream
+    _log_stream = stream
+
+
+class StartupTimer:
+    """Logs elapsed time per startup phase, to catch cold-start regressions."""
+
+    def __init__(self, t0: Optional[float] = None):
+        self.t0     = t0 if t0 is not None else time.perf_counter()
+        self.last   = self.t0
+        self.phases = []   # (phase, ms since t0)
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        total_ms = (now - self.t0) * 1000
+        log(f"Startup [{phase}] +{(now - self.last) * 1000:.0f} ms  (total {total_ms:.0f} ms)")
+        self.phases.append((phase, round(total_ms)))
+        self.last = now
+
+    def summary(self):
+        parts = "  ".join(f"{phase}={ms}ms" for phase, ms in self.phases)
+        log(f"Startup v{APP_VERSION}: {parts}", "OK")
+
+
+class RangeNotSupported(Exception):
+    """Server does not honour byte ranges — use a single stream instead."""
+
+
+class JobInterrupted(Exception):
+    """Raised between chunks (or from a yt-dlp hook) to pause or cancel a job."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason   # "pause" or "cancel"
+
+
+# ─────────────────────────────────────────────
+#  HTTP SESSION
+# ─────────────────────────────────────────────
+_session      = None
+_session_lock = threading.Lock()
+
+
+def http_session() -> "requests.Session":
+    """
+    Process-wide keep-alive session. The connection pool is sized for
+    every worker × segment, and idempotent requests are retried with
+    exponential backoff on connection errors and 429/5xx answers.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            retry = Retry(
+                total=HTTP_RETRIES,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset({"GET", "HEAD"}),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=MAX_CONCURRENT_DOWNLOADS,
+                pool_maxsize=HTTP_POOL_SIZE,
+                max_retries=retry,
+            )
+            session = requests.Session()
+            session.headers.update(HTTP_HEADERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+class ChunkReader:
+    """
+    Iterates a streamed `requests` response as memoryviews over one
+    reusable buffer. Identity-encoded bodies are read straight into it
+    from the socket file, so no bytes object is allocated per chunk
+    (urllib3's readinto() reads into a temporary bytes and copies). The
+    read size doubles while reads (plus whatever the caller does with
+    them, e.g. bandwidth throttling) finish well under CHUNK_TARGET_TIME
+    and halves when they take much longer. A view is only valid until
+    the next iteration. A body shorter than its Content-Length raises
+    ChunkedEncodingError, as iter_content() does.
+    """
+
+    def __init__(self, response, size: int = CHUNK_SIZE):
+        raw    = response.raw
+        fp     = getattr(raw, "_fp", None)
+        length = response.headers.get("content-length", "")
+        if not response.headers.get("content-encoding") and hasattr(fp, "readinto"):
+            # http.client returns 0 on an early close instead of raising,
+            # so the length is checked here
+            self._readinto = fp.readinto
+            self._expected = int(length) if length.isdigit() else None
+        else:
+            raw.decode_content         = True
+            raw.enforce_content_length = True   # urllib3 1.x defaults to False
+            self._readinto = raw.readinto
+            self._expected = None
+        self.received = 0
+        self.size  = max(CHUNK_MIN, min(CHUNK_MAX, size))
+        self._buf  = bytearray(self.size)
+        self._view = memoryview(self._buf)
+
+    def __iter__(self):
+        import http.client
+        from requests.exceptions import ChunkedEncodingError, ConnectionError as RequestsConnectionError
+        from urllib3.exceptions import ProtocolError
+
+        started = time.monotonic()
+        while True:
+            if self.size > len(self._buf):
+                self._buf  = bytearray(self.size)   # grow only; old views stay valid
+                self._view = memoryview(self._buf)
+            try:
+                n = self._readinto(self._view[: self.size])
+            except TimeoutError as exc:
+                raise RequestsConnectionError(exc) from exc
+            except (ProtocolError, http.client.HTTPException, OSError) as exc:
+                raise ChunkedEncodingError(exc) from exc
+            if not n:
+                if self._expected is not None and self.received < self._expected:
+                    raise ChunkedEncodingError(
+                        f"Connection broken: IncompleteRead({self.received} bytes read, "
+                        f"{self._expected - self.received} more expected)"
+                    )
+                return
+            self.received += n
+            yield self._view[:n]
+            now = time.monotonic()
+            self._adapt(n, now - started)
+            started = now
+
+    def _adapt(self, n: int, elapsed: float):
+        if n < self.size:
+            return   # short read (end of body) says nothing about speed
+        ideal = n / max(elapsed, 1e-6) * CHUNK_TARGET_TIME
+        if ideal >= self.size * 2:
+            self.size = min(self.size * 2, CHUNK_MAX)
+        elif ideal < self.size / 2:
+            self.size = max(self.size // 2, CHUNK_MIN)
+
+
+class FsyncBatcher:
+    """Flush + fsync a file after every FSYNC_EVERY bytes (no-op when 0)."""
+
+    def __init__(self, f, every: int = FSYNC_EVERY):
+        self.f       = f
+        self.every   = every
+        self.pending = 0
+
+    def add(self, n: int):
+        if not self.every:
+            return
+        self.pending += n
+        if self.pending >= self.every:
+            self.sync()
+
+    def sync(self):
+        if self.every and self.pending:
+            self.f.flush()
+            os.fsync(self.f.fileno())
+            self.pending = 0
+
+
+def warm_up(on_ready=None) -> threading.Thread:
+    """
+    Import the heavy download stack (requests, yt-dlp and its extractor
+    table) on a background thread so the first download doesn't pay for
+    it. `on_ready()` is called from that thread when done.
+    """
+    def _run():
+        t0 = time.perf_counter()
+        try:
+            http_session()
+            import yt_dlp  # noqa: F401
+            from yt_dlp.extractor import gen_extractor_classes
+            gen_extractor_classes()
+            log(f"Engine warm in {(time.perf_counter() - t0) * 1000:.0f} ms", "OK")
+        except Exception as e:
+            log(f"Engine warm-up failed: {e}", "WARN")
+        if on_ready:
+            on_ready()
+
+    t = threading.Thread(target=_run, name="engine-warm-up", daemon=True)
+    t.start()
+    return t
+
+
+# ─────────────────────────────────────────────
+#  URL RESOLVER
+# ─────────────────────────────────────────────
+# Registrable host → platform; lookups walk up the labels, so
+# "m.youtube.com" or "vm.tiktok.com" need no entry of their own.
+_PLATFORM_HOSTS = {
+    "tiktok.com":           "TikTok",
+    "youtube.com":          "YouTube",
+    "youtu.be":             "YouTube",
+    "youtube-nocookie.com": "YouTube",
+    "instagram.com":        "Instagram",
+    "instagr.am":           "Instagram",
+}
+_CANONICAL_HOSTS = {"TikTok": "tiktok.com", "YouTube": "youtube.com", "Instagram": "instagram.com"}
+
+# Links that only reveal the video after an HTTP redirect
+_SHORTLINK_HOSTS = {"vm.tiktok.com", "vt.tiktok.com"}
+_SHORTLINK_PATHS = {"TikTok": ("/t/",), "Instagram": ("/share/",)}
+
+_TRACKING_PARAMS = {
+    "si", "feature", "pp", "ab_channel",                          # YouTube
+    "igshid", "igsh", "img_index",                                # Instagram
+    "_r", "_t", "is_from_webapp", "sender_device", "is_copy_url",
+    "u_code", "preview_pb", "share_app_id", "share_item_id",
+    "share_link_id", "social_sharing", "source", "timestamp",
+    "user_id", "sec_uid", "web_id", "checksum", "language",       # TikTok
+    "fbclid", "gclid",
+}
+
+_URL_IN_TEXT   = re.compile(r"https?://[^\s<>\"']+")
+_YT_VIDEO_PATH = re.compile(r"^/(?:shorts|live|embed|v)/([\w-]{6,})")
+_VIDEO_IDS     = {
+    "TikTok":    re.compile(r"^/(?:@[^/]*/)?(?:video|photo)/(\d+)"),
+    "Instagram": re.compile(r"^/(?:[\w.]+/)?(?:reels?|p|tv)/([\w-]+)"),
+}
+
+
+@lru_cache(maxsize=256)
+def _host_platform(host: str) -> str:
+    labels = host.split(".")
+    for i in range(len(labels) - 1):
+        platform_name = _PLATFORM_HOSTS.get(".".join(labels[i:]))
+        if platform_name:
+            return platform_name
+    return "unknown"
+
+
+def detect_platform(url: str) -> str:
+    """TikTok / YouTube / Instagram from the URL host, else "unknown"."""
+    return _host_platform((urlsplit(url.strip()).hostname or "").lower())
+
+
+def _strip_tracking(query: str) -> list:
+    return [
+        (k, v) for k, v in parse_qsl(query)
+        if k not in _TRACKING_PARAMS and not k.startswith("utm_")
+    ]
+
+
+def clean_url(url: str) -> str:
+    """The URL without tracking parameters or fragment; host and path untouched."""
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme or "https", parts.netloc, parts.path,
+                       urlencode(_strip_tracking(parts.query)), ""))
+
+
+def is_short_link(url: str) -> bool:
+    parts = urlsplit(url.strip())
+    host  = (parts.hostname or "").lower()
+    return host in _SHORTLINK_HOSTS or parts.path.startswith(
+        _SHORTLINK_PATHS.get(_host_platform(host), ())
+    )
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a video URL, used as a cache / dedup key: one
+    host per platform, no tracking parameters, and one URL per video id
+    (youtu.be, /shorts/ and watch?v= all become the same key).
+    """
+    parts = urlsplit(url.strip())
+    host  = (parts.hostname or "").lower()
+    path  = parts.path.rstrip("/")
+    query = _strip_tracking(parts.query)
+    platform_name = _host_platform(host)
+    if host not in _SHORTLINK_HOSTS:
+        host = _CANONICAL_HOSTS.get(platform_name) or host.removeprefix("www.").removeprefix("m.")
+
+    if platform_name == "YouTube":
+        m = _YT_VIDEO_PATH.match(path)
+        if parts.hostname and parts.hostname.lower() == "youtu.be" and path:
+            path, query = "/watch", [("v", path[1:])] + query
+        elif m:
+            path, query = "/watch", [("v", m.group(1))] + query
+    elif platform_name in _VIDEO_IDS:
+        m = _VIDEO_IDS[platform_name].match(path)
+        if m:
+            path = "/p/" + m.group(1) if platform_name == "Instagram" else "/video/" + m.group(1)
+    return urlunsplit(("https", host, path, urlencode(sorted(query)), ""))
+
+
+def url_video_id(url: str) -> str:
+    """Video id readable from the URL itself, else ""."""
+    norm  = urlsplit(normalize_url(url))
+    platform_name = _host_platform(norm.hostname or "")
+    if platform_name == "YouTube":
+        return dict(parse_qsl(norm.query)).get("v", "") if norm.path == "/watch" else ""
+    m = _VIDEO_IDS[platform_name].match(norm.path) if platform_name in _VIDEO_IDS else None
+    return m.group(1) if m else ""
+
+
+def resolve_url(url: str, expand: bool = True) -> tuple:
+    """
+    (platform, video id, download URL) for a shared link. Short links
+    are expanded once through RedirectCache; the returned URL has its
+    tracking parameters stripped. The id is "" when only extraction
+    can tell (profiles, playlists, unexpanded short links).
+    """
+    if expand and is_short_link(url):
+        url = RedirectCache.expand(url)
+    url = clean_url(url)
+    return detect_platform(url), url_video_id(url), url
+
+
+def extract_urls(text: str) -> list:
+    """
+    Supported video URLs in free text (a chat message, a share sheet),
+    in order and de-duplicated by normalize_url. Falls back to the first
+    URL of any kind so the job can report why it is unsupported.
+    """
+    found = [url.rstrip(".,;:!?)]}>'\"") for url in _URL_IN_TEXT.findall(text or "")]
+    urls, seen = [], set()
+    for url in found:
+        key = normalize_url(url)
+        if detect_platform(url) != "unknown" and key not in seen:
+            seen.add(key)
+            urls.append(url)
+    return urls or found[:1]
+
+
+class RedirectCache:
+    """
+    Persistent short link → expanded URL map. Entries expire after
+    REDIRECT_CACHE_TTL; beyond REDIRECT_CACHE_MAX the least recently
+    used are evicted (the JSON file keeps LRU order). Only a miss costs
+    a network round-trip.
+    """
+
+    _lock = threading.Lock()
+    _data = None   # OrderedDict: short link → {"url", "ts"}, oldest use first
+
+    @classmethod
+    def expand(cls, url: str) -> str:
+        key = clean_url(url)
+        with cls._lock:
+            data  = cls._load()
+            entry = data.get(key)
+            if entry and time.time() - entry.get("ts", 0) < REDIRECT_CACHE_TTL:
+                data.move_to_end(key)   # persisted with the next insert
+                return entry["url"]
+
+        target = cls._follow(key)
+        if target == key or detect_platform(target) == "unknown":
+            return key   # unresolved (offline, blocked): let the extractor redirect
+        with cls._lock:
+            data = cls._load()
+            data[key] = {"url": target, "ts": time.time()}
+            data.move_to_end(key)
+            while len(data) > REDIRECT_CACHE_MAX:
+                data.popitem(last=False)
+            cls._save(data)
+        log(f"Short link expanded: {key} → {target}", "INFO")
+        return target
+
+    @staticmethod
+    def _follow(url: str) -> str:
+        import requests
+
+        try:
+            # GET (some short-link hosts refuse HEAD); the body is never read
+            with http_session().get(url, stream=True, allow_redirects=True,
+                                    timeout=REDIRECT_TIMEOUT) as r:
+                return clean_url(r.url)
+        except requests.RequestException as exc:
+            log(f"Short link expansion failed: {exc}", "WARN")
+            return url
+
+    @classmethod
+    def _load(cls) -> "OrderedDict":
+        # caller holds `_lock`
+        if cls._data is None:
+            cls._data = OrderedDict()
+            try:
+                if os.path.exists(REDIRECT_CACHE_FILE):
+                    with open(REDIRECT_CACHE_FILE, "r", encoding="utf-8") as f:
+                        cls._data.update(json.load(f))
+            except Exception as e:
+                log(f"Redirect cache load error: {e}", "WARN")
+        return cls._data
+
+    @staticmethod
+    def _save(data: "OrderedDict"):
+        # caller holds `_lock`
+        try:
+            tmp = REDIRECT_CACHE_FILE + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, REDIRECT_CACHE_FILE)
+        except Exception as e:
+            log(f"Redirect cache save error: {e}", "ERR")
+
+
+# ─────────────────────────────────────────────
+#  INFO CACHE
+# ─────────────────────────────────────────────
+class InfoCache:
+    """
+    On-disk cache of raw yt-dlp info dicts (one JSON file per URL).
+
+    Entries expire after INFO_CACHE_TTL or shortly before the signed
+    media URLs inside them do, whichever comes first. The file mtime
+    doubles as the LRU clock; beyond INFO_CACHE_MAX the oldest go.
+    """
+
+    _lock = threading.Lock()
+    _expire_re = re.compile(r"[?&/](?:x-)?expires?[=/](\d{10})\b")
+
+    @staticmethod
+    def _path(url: str) -> str:
+        key = hashlib.sha1(normalize_url(url).encode("utf-8")).hexdigest()
+        return os.path.join(INFO_CACHE_DIR, key + ".json")
+
+    @classmethod
+    def get(cls, url: str) -> Optional[dict]:
+        path = cls._path(url)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() >= entry.get("expires", 0):
+            cls.invalidate(url)
+            return None
+        try:
+            os.utime(path)   # mark as recently used
+        except OSError:
+            pass
+        return entry.get("info")
+
+    @classmethod
+    def put(cls, url: str, ydl, info: dict):
+        """Store a raw (unprocessed) info dict together with its cookies."""
+        # Private keys (e.g. "__post_extractor") hold callables — drop them
+        info = {
+            k: v for k, v in ydl.sanitize_info(info).items()
+            if not k.startswith("__")
+        }
+        cookies = cls._cookie_string(ydl.cookiejar)
+        if cookies:
+            info["cookies"] = cookies   # reloaded by yt-dlp when processing formats
+
+        expires = time.time() + INFO_CACHE_TTL
+        for fmt in info.get("formats") or [info]:
+            m = cls._expire_re.search(str(fmt.get("url", "")))
+            if m:
+                expires = min(expires, int(m.group(1)) - INFO_EXPIRY_MARGIN)
+        if expires <= time.time():
+            return
+
+        entry = {"url": url, "expires": expires, "info": info}
+        with cls._lock:
+            try:
+                os.makedirs(INFO_CACHE_DIR, exist_ok=True)
+                path = cls._path(url)
+                tmp  = path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(entry, f, ensure_ascii=False)
+                os.replace(tmp, path)
+                cls._evict()
+            except OSError as e:
+                log(f"Info cache write error: {e}", "WARN")
+
+    @classmethod
+    def invalidate(cls, url: str):
+        try:
+            os.remove(cls._path(url))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _evict():
+        entries = [
+            os.path.join(INFO_CACHE_DIR, f)
+            for f in os.listdir(INFO_CACHE_DIR)
+            if f.endswith(".json")
+        ]
+        if len(entries) <= INFO_CACHE_MAX:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[: len(entries) - INFO_CACHE_MAX]:
+            os.remove(path)
+
+    @staticmethod
+    def _cookie_string(cookiejar) -> str:
+        """Serialise a cookie jar the way yt-dlp's info JSON "cookies" field expects."""
+        encoder = SimpleCookie()
+        values  = []
+        for cookie in cookiejar:
+            values.append(f"{cookie.name}={encoder.value_encode(cookie.value)[1]}")
+            if cookie.domain:
+                values.append(f"Domain={cookie.domain}")
+            if cookie.path:
+                values.append(f"Path={cookie.path}")
+            if cookie.secure:
+                values.append("Secure")
+            if cookie.expires:
+                values.append(f"Expires={cookie.expires}")
+        return "; ".join(values)
+
+
+# ─────────────────────────────────────────────
+#  HISTORY MANAGER
+# ─────────────────────────────────────────────
+class HistoryManager:
+    """
+    Download history in SQLite (WAL mode). Appends are a single indexed
+    INSERT, one shared connection is guarded by a lock so concurrent
+    workers never lose records, and queries filter by platform /
+    success / time without loading the whole table.
+    """
+
+    _lock    = threading.Lock()
+    _conn    = None
+    _inserts = 0
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS history (
+            id       INTEGER PRIMARY KEY AUTOINCREMENT,
+            url      TEXT    NOT NULL,
+            platform TEXT    NOT NULL,
+            filepath TEXT    NOT NULL DEFAULT '',
+            success  INTEGER NOT NULL,
+            ts       REAL    NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_history_ts       ON history(ts);
+        CREATE INDEX IF NOT EXISTS idx_history_platform ON history(platform, ts);
+        CREATE INDEX IF NOT EXISTS idx_history_success  ON history(success, ts);
+    """
+
+    @classmethod
+    def _db(cls) -> sqlite3.Connection:
+        # caller holds `_lock`
+        if cls._conn is None:
+            conn = sqlite3.connect(HISTORY_DB, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(cls._SCHEMA)
+            cls._conn = conn
+            cls._import_legacy(conn)
+        return cls._conn
+
+    @staticmethod
+    def _import_legacy(conn: sqlite3.Connection):
+        """One-time import of the old download_history.json."""
+        if not os.path.exists(HISTORY_FILE):
+            return
+        try:
+            with open(HISTORY_FILE, "r", encoding="utf-8") as f:
+                records = json.load(f)
+            rows = []
+            for rec in records:
+                try:
+                    ts = datetime.strptime(rec.get("timestamp", ""), "%d.%m.%Y %H:%M").timestamp()
+                except ValueError:
+                    ts = time.time()
+                rows.append((
+                    rec.get("url", ""), rec.get("platform", "unknown"),
+                    rec.get("filepath") or "", int(bool(rec.get("success"))), ts,
+                ))
+            with conn:
+                conn.executemany(
+                    "INSERT INTO history (url, platform, filepath, success, ts) "
+                    "VALUES (?, ?, ?, ?, ?)", rows,
+                )
+            os.replace(HISTORY_FILE, HISTORY_FILE + ".bak")
+            log(f"Imported {len(rows)} history records from {HISTORY_FILE}", "OK")
+        except Exception as e:
+            log(f"Legacy history import failed: {e}", "WARN")
+
+    @staticmethod
+    def _to_record(row: sqlite3.Row) -> dict:
+        return {
+            "id":        row["id"],
+            "url":       row["url"],
+            "platform":  row["platform"],
+            "filepath":  row["filepath"],
+            "success":   bool(row["success"]),
+            "ts":        row["ts"],
+            "timestamp": datetime.fromtimestamp(row["ts"]).strftime("%d.%m.%Y %H:%M"),
+        }
+
+    @classmethod
+    def add(cls, url: str, plat: str, filepath: str, success: bool) -> Optional[dict]:
+        try:
+            with cls._lock:
+                conn = cls._db()
+                with conn:
+                    cur = conn.execute(
+                        "INSERT INTO history (url, platform, filepath, success, ts) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (url, plat, filepath or "", int(success), time.time()),
+                    )
+                row = conn.execute(
+                    "SELECT * FROM history WHERE id = ?", (cur.lastrowid,)
+                ).fetchone()
+                cls._inserts += 1
+                if HISTORY_RETENTION and cls._inserts % HISTORY_PRUNE_EVERY == 0:
+                    cls._prune(conn)
+            return cls._to_record(row)
+        except sqlite3.Error as e:
+            log(f"History save error: {e}", "ERR")
+            return None
+
+    @staticmethod
+    def _prune(conn: sqlite3.Connection):
+        with conn:
+            conn.execute(
+                "DELETE FROM history WHERE id <= "
+                "(SELECT id FROM history ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (HISTORY_RETENTION,),
+            )
+
+    @staticmethod
+    def _where(platform: Optional[str], success: Optional[bool],
+               since: Optional[float], until: Optional[float]):
+        clauses, params = [], []
+        if platform is not None:
+            clauses.append("platform = ?")
+            params.append(platform)
+        if success is not None:
+            clauses.append("success = ?")
+            params.append(int(success))
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    @classmethod
+    def query(cls, platform: Optional[str] = None, success: Optional[bool] = None,
+              since: Optional[float] = None, until: Optional[float] = None,
+              limit: Optional[int] = None, offset: int = 0) -> list:
+        """Matching records, newest first."""
+        where, params = cls._where(platform, success, since, until)
+        sql = f"SELECT * FROM history{where} ORDER BY ts DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        try:
+            with cls._lock:
+                rows = cls._db().execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            log(f"History query error: {e}", "ERR")
+            return []
+        return [cls._to_record(row) for row in rows]
+
+    @classmethod
+    def count(cls, platform: Optional[str] = None, success: Optional[bool] = None,
+              since: Optional[float] = None, until: Optional[float] = None) -> int:
+        where, params = cls._where(platform, success, since, until)
+        try:
+            with cls._lock:
+                return cls._db().execute(
+                    f"SELECT COUNT(*) FROM history{where}", params
+                ).fetchone()[0]
+        except sqlite3.Error as e:
+            log(f"History query error: {e}", "ERR")
+            return 0
+
+    @classmethod
+    def get_all(cls) -> list:
+        """All records, oldest first."""
+        return list(reversed(cls.query()))
+
+    @classmethod
+    def clear(cls):
+        try:
+            with cls._lock:
+                conn = cls._db()
+                with conn:
+                    conn.execute("DELETE FROM history")
+        except sqlite3.Error as e:
+            log(f"History clear error: {e}", "ERR")
+
+
+# ─────────────────────────────────────────────
+#  DOWNLOAD INDEX (dedup)
+# ─────────────────────────────────────────────
+class DownloadIndex:
+    """
+    Maps (platform, video id, quality) → {path, size, sha256} for
+    finished downloads, plus normalized URL → key so short links hit as
+    well. The quality is the FormatPolicy spec that chose the file, so a
+    480p copy is never handed to a "best" request.
+    Stored as two tables in HISTORY_DB, so recording a download is one
+    upsert. A file is only reused while it still exists with the
+    recorded size; with DEDUP_VERIFY_HASH its content hash must match
+    too (taken on first verification, so nothing hashes by default).
+    """
+
+    _lock = threading.Lock()
+    _conn = None
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS download_index (
+            key     TEXT    NOT NULL,
+            quality TEXT    NOT NULL,
+            path    TEXT    NOT NULL,
+            size    INTEGER NOT NULL,
+            sha256  TEXT    NOT NULL DEFAULT '',
+            ts      REAL    NOT NULL,
+            PRIMARY KEY (key, quality)
+        );
+        CREATE TABLE IF NOT EXISTS download_urls (
+            url     TEXT    PRIMARY KEY,
+            key     TEXT    NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_download_urls_key ON download_urls(key);
+    """
+
+    @classmethod
+    def _db(cls) -> sqlite3.Connection:
+        # caller holds `_lock`
+        if cls._conn is None:
+            conn = sqlite3.connect(HISTORY_DB, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(cls._SCHEMA)
+            cls._conn = conn
+        return cls._conn
+
+    @classmethod
+    def video_id(cls, url: str) -> str:
+        """Video id from the URL itself, or from a cached info dict."""
+        video_id = url_video_id(url)
+        if video_id:
+            return video_id
+        info = InfoCache.get(url)
+        return str(info.get("id") or "") if info else ""
+
+    @classmethod
+    def lookup(cls, url: str, plat: str, video_id: str, quality: str) -> Optional[str]:
+        """Path of an intact earlier download of this video at `quality`, else None."""
+        try:
+            with cls._lock:
+                conn = cls._db()
+                key  = f"{plat}:{video_id}" if video_id else None
+                if key is None:
+                    row = conn.execute("SELECT key FROM download_urls WHERE url = ?",
+                                       (normalize_url(url),)).fetchone()
+                    key = row["key"] if row else None
+                entry = conn.execute(
+                    "SELECT * FROM download_index WHERE key = ? AND quality = ?",
+                    (key, quality),
+                ).fetchone() if key else None
+        except sqlite3.Error as e:
+            log(f"Download index read error: {e}", "WARN")
+            return None
+        if not entry:
+            return None
+
+        path = entry["path"]
+        try:
+            intact = os.path.getsize(path) == entry["size"]
+        except OSError:
+            intact = False
+        if intact and DEDUP_VERIFY_HASH:
+            digest = cls.file_hash(path)
+            if not entry["sha256"]:
+                cls._store_hash(key, quality, digest)   # first verification sets the reference
+            intact = digest == (entry["sha256"] or digest)
+        if not intact:
+            log(f"Indexed file gone or truncated, re-downloading: {path}", "WARN")
+            cls.forget(key, quality)
+            return None
+        return path
+
+    @classmethod
+    def record(cls, url: str, plat: str, video_id: str, quality: str, path: str):
+        if not video_id:
+            return
+        key    = f"{plat}:{video_id}"
+        digest = cls.file_hash(path) if DEDUP_VERIFY_HASH else ""
+        try:
+            with cls._lock:
+                conn = cls._db()
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO download_index "
+                        "(key, quality, path, size, sha256, ts) VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, quality, path, os.path.getsize(path), digest, time.time()),
+                    )
+                    conn.execute(
+                        "INSERT OR REPLACE INTO download_urls (url, key) VALUES (?, ?)",
+                        (normalize_url(url), key),
+                    )
+        except (sqlite3.Error, OSError) as e:
+            log(f"Download index save error: {e}", "ERR")
+
+    @classmethod
+    def forget(cls, key: str, quality: str):
+        try:
+            with cls._lock:
+                conn = cls._db()
+                with conn:
+                    conn.execute("DELETE FROM download_index WHERE key = ? AND quality = ?",
+                                 (key, quality))
+                    conn.execute("DELETE FROM download_urls WHERE key = ? AND NOT EXISTS "
+                                 "(SELECT 1 FROM download_index WHERE key = ?)", (key, key))
+        except sqlite3.Error as e:
+            log(f"Download index save error: {e}", "ERR")
+
+    @classmethod
+    def _store_hash(cls, key: str, quality: str, digest: str):
+        try:
+            with cls._lock:
+                conn = cls._db()
+                with conn:
+                    conn.execute("UPDATE download_index SET sha256 = ? "
+                                 "WHERE key = ? AND quality = ?", (digest, key, quality))
+        except sqlite3.Error as e:
+            log(f"Download index save error: {e}", "ERR")
+
+    @staticmethod
+    def file_hash(path: str) -> str:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                h.update(block)
+        return h.hexdigest()
+
+
+# ─────────────────────────────────────────────
+#  DOWNLOAD QUEUE
+# ─────────────────────────────────────────────
+class DownloadJob:
+    """A single download request and its live state."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, url: str, priority: int = PRIORITY_NORMAL):
+        self.id        = next(self._ids)
+        self.url       = url
+        self.priority  = priority
+        self.state     = JOB_QUEUED
+        self.platform  = "unknown"
+        self.progress  = 0
+        self.message   = "Queued…"
+        self.filepath  = ""
+        self.video_id  = ""
+        self.error     = ""
+        self.downloaded  = 0   # bytes
+        self.total_bytes = 0   # 0 = unknown
+        self.speed       = 0   # bytes/s
+        self.quality   = ""     # FormatPolicy spec ("" = engine default)
+        self.format    = ""     # chosen yt-dlp format id, kept for resumes
+        self.target    = ""     # output path (or template until known)
+        self.partials  = set()  # every output path written to, per stream
+        self.resumes   = 0      # restarts from the job journal
+        self.rate_limit = 0     # bytes/s cap for this job (0 = scheduler default)
+        self.parent    = None   # collection job this entry belongs to
+        self.title     = ""     # collection title
+        self.children  = []     # entry jobs, for a collection
+        self.metrics   = None   # JobMetrics, set when the job starts
+        self.stop_request = ""  # "pause" / "cancel", honoured between chunks
+        self.queue_seq = None   # ticket of its live entry in the pending queue
+        self.on_change = None   # set by DownloadQueue
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+    @property
+    def paused(self) -> bool:
+        """True for a paused job, or a collection whose open entries are all paused."""
+        if self.children:
+            open_ = [c for c in self.children if not c.finished]
+            return bool(open_) and all(c.state == JOB_PAUSED for c in open_)
+        return self.state == JOB_PAUSED
+
+    def check_stop(self):
+        """Called by the engines between chunks; raises JobInterrupted."""
+        if self.stop_request:
+            raise JobInterrupted(self.stop_request)
+
+    def discard_partial(self):
+        """
+        Delete the partial data of a cancelled job (best effort): the
+        .part / manifest / .ytdl files of every output it wrote, yt-dlp's
+        fragment files and finished sibling DASH streams
+        ("name.f137.mp4"). Only known paths — no directory scan.
+        """
+        streams = [f".f{fid}." for fid in self.format.split("+")] if "+" in self.format else []
+        for path in self.partials | ({self.target} if self.target else set()):
+            doomed = [path + ".part", path + ".part.json", path + ".ytdl"]
+            if any(tag in os.path.basename(path) for tag in streams):
+                doomed.append(path)   # a stream the ffmpeg merge never consumed
+            try:
+                with open(path + ".ytdl", "r", encoding="utf-8") as f:
+                    last = json.load(f)["downloader"]["current_fragment"]["index"]
+            except (OSError, ValueError, KeyError, TypeError):
+                last = 0
+            if last:
+                doomed += [f"{path}.part-Frag{i}"
+                           for i in range(1, last + FRAGMENT_CONCURRENCY + 1)]
+            for name in doomed:
+                try:
+                    os.remove(name)
+                except OSError:
+                    pass
+        self.partials.clear()
+
+    def update(self, **fields):
+        """Set job fields and notify the owning queue."""
+        for key, value in fields.items():
+            setattr(self, key, value)
+        if self.on_change:
+            self.on_change(self)
+
+
+class DownloadQueue:
+    """
+    Bounded worker pool that runs DownloadJobs through `handler`.
+
+    Jobs are ordered by (priority, submit order). `handler(job)` runs on
+    a worker thread and is expected to move the job to DONE or FAILED;
+    `on_change(job)` is called (from any thread) on every job update.
+    With a `journal`, unfinished jobs are persisted on every update.
+    """
+
+    def __init__(self, handler, workers: int = MAX_CONCURRENT_DOWNLOADS, on_change=None,
+                 journal: Optional["JobJournal"] = None):
+        self.on_change = on_change
+        self.journal   = journal
+        self.jobs      = {}   # id → DownloadJob, in submit order
+        self._handler  = handler
+        self._workers  = max(1, workers)
+        self._pending  = queue.PriorityQueue()
+        self._seq      = itertools.count()
+        self._threads  = []
+        self._lock     = threading.Lock()
+        self._rollup_lock = threading.Lock()
+
+    def submit(self, url: str, priority: int = PRIORITY_NORMAL, **fields) -> DownloadJob:
+        return self.submit_many([url], priority, **fields)[0]
+
+    def submit_many(self, urls: list, priority: int = PRIORITY_NORMAL, **fields) -> list:
+        """
+        Queue several jobs with the same fields. All of them are created
+        (and attached to their `parent`) before any can start, so a
+        collection never looks finished while entries are still coming.
+        Jobs created with state=JOB_PAUSED are registered but not queued;
+        resume() queues them.
+        """
+        jobs = []
+        for url in urls:
+            job = DownloadJob(url, priority)
+            for key, value in fields.items():
+                setattr(job, key, value)
+            if job.parent is not None:
+                job.parent.children.append(job)
+            job.on_change = self._notify
+            jobs.append(job)
+        with self._lock:
+            for job in jobs:
+                self.jobs[job.id] = job
+            self._ensure_workers()
+        for job in jobs:
+            if job.state != JOB_PAUSED:
+                self._enqueue(job)
+                log(f"Job #{job.id} queued (priority {priority}): {job.url}")
+            self._notify(job)
+        return jobs
+
+    def _enqueue(self, job: DownloadJob):
+        job.queue_seq = next(self._seq)
+        self._pending.put((job.priority, job.queue_seq, job))
+
+    def restore(self, entries: list) -> list:
+        """Re-submit unfinished jobs read from a JobJournal."""
+        jobs = []
+        for entry in entries:
+            offset = entry.get("offset", 0)
+            paused = entry.get("state") == JOB_PAUSED
+            if paused:   # stays off the queue until the user resumes it
+                message = f"Paused at {format_bytes(offset)}" if offset else "Paused"
+            else:
+                message = f"Resuming at {format_bytes(offset)}…" if offset else "Resuming…"
+            job = self.submit(
+                entry["url"], entry.get("priority", PRIORITY_NORMAL),
+                quality=entry.get("quality", ""),
+                format=entry.get("format", ""),
+                target=entry.get("target", ""),
+                partials=set(entry.get("partials", ())),
+                platform=entry.get("platform", "unknown"),
+                downloaded=offset,
+                total_bytes=entry.get("total", 0),
+                # only a job that was running can have died mid-transfer;
+                # queued and paused ones never started, so don't count them
+                resumes=entry.get("resumes", 0) + (entry.get("state") == JOB_RUNNING),
+                state=JOB_PAUSED if paused else JOB_QUEUED,
+                message=message,
+            )
+            jobs.append(job)
+        return jobs
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a job; a running one stops at its next chunk and drops its data."""
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        if job.children:
+            return any([self.cancel(child.id) for child in job.children])
+        if job.state == JOB_RUNNING:
+            job.stop_request = "cancel"
+            job.update(message="Cancelling…")
+            return True
+        job.discard_partial()   # paused jobs still have theirs
+        job.update(state=JOB_CANCELLED, speed=0, message="Cancelled")
+        return True
+
+    def pause(self, job_id: int) -> bool:
+        """
+        Pause a job. A running one stops at its next chunk, keeps its
+        partial data and frees its worker slot (and bandwidth share).
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        if job.children:
+            return any([self.pause(child.id) for child in job.children])
+        if job.state == JOB_RUNNING:
+            job.stop_request = "pause"
+            job.update(message="Pausing…")
+            return True
+        if job.state == JOB_QUEUED:
+            job.update(state=JOB_PAUSED, message="Paused")
+            return True
+        return False
+
+    def resume(self, job_id: int) -> bool:
+        """Re-queue a paused job; it continues from its partial data."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return False
+        if job.children:
+            return any([self.resume(child.id) for child in job.children])
+        if job.state != JOB_PAUSED:
+            return False
+        job.stop_request = ""
+        job.update(state=JOB_QUEUED, message="Queued (resume)…")
+        self._enqueue(job)
+        return True
+
+    def clear_finished(self) -> list:
+        """Forget finished jobs; returns the removed ones."""
+        with self._lock:
+            removed = [job for job in self.jobs.values() if job.finished]
+            for job in removed:
+                del self.jobs[job.id]
+        return removed
+
+    def counts(self) -> dict:
+        counts = {}
+        for job in list(self.jobs.values()):
+            counts[job.state] = counts.get(job.state, 0) + 1
+        return counts
+
+    def join(self):
+        """Block until every submitted job has been processed."""
+        self._pending.join()
+
+    def _ensure_workers(self):
+        while len(self._threads) < self._workers:
+            t = threading.Thread(
+                target=self._run,
+                name=f"download-worker-{len(self._threads) + 1}",
+                daemon=True,
+            )
+            self._threads.append(t)
+            t.start()
+
+    def _run(self):
+        while True:
+            _priority, seq, job = self._pending.get()
+            try:
+                # Skip cancelled / paused jobs and entries superseded by resume()
+                if job.state != JOB_QUEUED or seq != job.queue_seq:
+                    continue
+                job.update(state=JOB_RUNNING, message="Starting…")
+                try:
+                    self._handler(job)
+                except Exception as exc:
+                    log(f"Job #{job.id} crashed: {exc}", "ERR")
+                    job.update(state=JOB_FAILED, error=str(exc))
+                # Collections finish via _roll_up; paused jobs wait for resume()
+                if not job.finished and not job.children and job.state != JOB_PAUSED:
+                    job.update(state=JOB_FAILED, message="Worker exited early")
+            finally:
+                self._pending.task_done()
+
+    def _notify(self, job: DownloadJob):
+        if self.journal:
+            self.journal.track(job)
+        if self.on_change:
+            self.on_change(job)
+        if job.parent is not None:
+            self._roll_up(job.parent)
+
+    def _roll_up(self, parent: DownloadJob):
+        """Aggregate entry progress into their collection job."""
+        with self._rollup_lock:
+            children = list(parent.children)
+            finished = [c for c in children if c.finished]
+            saved    = sum(1 for c in finished if c.state == JOB_DONE)
+            failed   = len(finished) - saved
+            paused   = sum(1 for c in children if c.state == JOB_PAUSED)
+            fields   = {
+                "progress":    int(sum(100 if c.finished else c.progress for c in children)
+                                   / len(children)),
+                "downloaded":  sum(c.downloaded for c in children),
+                "total_bytes": sum(c.total_bytes for c in children),
+                "speed":       sum(c.speed for c in children if c.state == JOB_RUNNING),
+                "message":     f"{parent.title}: {saved}/{len(children)} saved"
+                               + (f", {failed} failed" if failed else "")
+                               + (f", {paused} paused" if paused else ""),
+            }
+            if len(finished) == len(children) and not parent.finished:
+                fields["state"] = JOB_DONE if saved else JOB_FAILED
+            parent.update(**fields)
+
+
+class JobJournal:
+    """
+    Durable list of unfinished (queued / running) jobs: URL, format,
+    target path and byte offset. Every write goes to a temp file that
+    is fsynced and then renamed over the journal, so a killed process
+    leaves either the old or the new version. Progress-only changes
+    are written at most once per JOURNAL_SAVE_INTERVAL.
+    """
+
+    def __init__(self, path: str = JOB_JOURNAL_FILE):
+        self.path      = path
+        self._entries  = {}   # job id → entry, in submit order
+        self._lock     = threading.Lock()
+        self._saved_at = 0.0
+
+    def pending(self) -> list:
+        """Entries left by the previous run, minus jobs stuck in a crash loop."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f).get("jobs", [])
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError, AttributeError) as exc:
+            log(f"Job journal unreadable, ignoring it: {exc}", "WARN")
+            return []
+
+        keep = [e for e in entries if e.get("url") and e.get("resumes", 0) < JOURNAL_MAX_RESUMES]
+        if len(keep) < len(entries):
+            log(f"Dropped {len(entries) - len(keep)} job(s) that failed to resume", "WARN")
+        return keep
+
+    def track(self, job: DownloadJob):
+        with self._lock:
+            old = self._entries.get(job.id)
+            if job.finished or job.children:   # a collection lives on in its entries
+                if old is not None:
+                    del self._entries[job.id]
+                    self._save()
+                return
+            entry = {
+                "url":      job.url,
+                "priority": job.priority,
+                "platform": job.platform,
+                "quality":  job.quality,
+                "format":   job.format,
+                "target":   job.target,
+                "partials": sorted(job.partials),
+                "offset":   job.downloaded,
+                "total":    job.total_bytes,
+                "state":    job.state,
+                "resumes":  job.resumes,
+            }
+            self._entries[job.id] = entry   # an existing key keeps its submit position
+            progress_only = old is not None and all(
+                old[k] == entry[k] for k in entry if k not in ("offset", "total")
+            )
+            if not progress_only or time.monotonic() - self._saved_at >= JOURNAL_SAVE_INTERVAL:
+                self._save()
+
+    def _save(self):
+        # caller holds `_lock`
+        self._saved_at = time.monotonic()
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"jobs": list(self._entries.values())}, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError as exc:
+            log(f"Job journal write error: {exc}", "WARN")
+
+
+class ProgressAggregator:
+    """
+    Coalesces job updates: `push(job)` only marks the job dirty, and
+    `flush()` hands the latest state of each dirty job to `flush_fn`
+    once. Driven by Clock.schedule_interval in the UI, or by its own
+    thread (`start()`) in batch mode, at PROGRESS_FLUSH_HZ.
+    """
+
+    def __init__(self, flush_fn, hz: float = PROGRESS_FLUSH_HZ):
+        self.interval = 1.0 / hz
+        self._flush_fn = flush_fn
+        self._dirty    = {}   # job id → job
+        self._lock     = threading.Lock()
+        self._stop     = threading.Event()
+
+    def push(self, job: DownloadJob):
+        with self._lock:
+            self._dirty[job.id] = job
+
+    def flush(self, *_args):
+        with self._lock:
+            jobs = list(self._dirty.values())
+            self._dirty.clear()
+        if jobs:
+            self._flush_fn(jobs)
+
+    def start(self) -> threading.Thread:
+        def _loop():
+            while not self._stop.wait(self.interval):
+                self.flush()
+        t = threading.Thread(target=_loop, name="progress-flush", daemon=True)
+        t.start()
+        return t
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+
+def format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def format_eta(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+# ─────────────────────────────────────────────
+#  BANDWIDTH
+# ─────────────────────────────────────────────
+class TokenBucket:
+    """`rate` bytes/s with up to BANDWIDTH_BURST seconds of tokens banked."""
+
+    def __init__(self, rate: float = 0):
+        self._lock = threading.Lock()
+        self.rate   = 0.0
+        self.tokens = 0.0
+        self.stamp  = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill()
+            self.rate   = max(0.0, rate)
+            self.tokens = min(self.tokens, self.rate * BANDWIDTH_BURST)
+
+    def reserve(self, n: int) -> float:
+        """Take `n` tokens (going into debt if needed); returns seconds to wait."""
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            self._refill()
+            self.tokens -= n
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def _refill(self):
+        # caller holds `_lock`
+        now = time.monotonic()
+        if self.rate > 0:
+            self.tokens = min(self.rate * BANDWIDTH_BURST,
+                              self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+
+class BandwidthScheduler:
+    """
+    Splits a global byte rate between running jobs by weight: job
+    priority (PRIORITY_WEIGHTS), boosted for short clips so they finish
+    first. Shares are capped per job (job.rate_limit or the default job
+    limit) and whatever a capped job can't use goes to the others.
+
+    Chunk loops call `consume(job, n)` after reading `n` bytes and sleep
+    off any debt; yt-dlp does the same from its progress hook.
+    """
+
+    def __init__(self, global_limit: int = BANDWIDTH_GLOBAL_LIMIT,
+                 job_limit: int = BANDWIDTH_JOB_LIMIT):
+        self.global_limit = global_limit
+        self.job_limit    = job_limit
+        self._jobs = {}   # job id → [job, weight, TokenBucket]
+        self._lock = threading.Lock()
+
+    def set_limits(self, global_limit: Optional[int] = None, job_limit: Optional[int] = None):
+        with self._lock:
+            if global_limit is not None:
+                self.global_limit = global_limit
+            if job_limit is not None:
+                self.job_limit = job_limit
+            self._rebalance()
+
+    def register(self, job: DownloadJob):
+        with self._lock:
+            self._jobs[job.id] = [job, self.weight(job), TokenBucket()]
+            self._rebalance()
+
+    def unregister(self, job: DownloadJob):
+        with self._lock:
+            if self._jobs.pop(job.id, None) is not None:
+                self._rebalance()
+
+    def job_cap(self, job: DownloadJob) -> int:
+        return job.rate_limit or self.job_limit
+
+    def rate_for(self, job: DownloadJob) -> float:
+        entry = self._jobs.get(job.id)
+        return entry[2].rate if entry else float(self.job_cap(job))
+
+    def consume(self, job: DownloadJob, n: int):
+        entry = self._jobs.get(job.id)
+        if entry is None:
+            return
+        weight = self.weight(job)
+        if weight != entry[1]:   # e.g. size just became known
+            with self._lock:
+                entry[1] = weight
+                self._rebalance()
+        wait = entry[2].reserve(n)
+        if wait > 0:
+            time.sleep(wait)
+
+    @staticmethod
+    def weight(job: DownloadJob) -> int:
+        weight = PRIORITY_WEIGHTS.get(job.priority, 1)
+        if 0 < job.total_bytes < SHORT_CLIP_BYTES:
+            weight *= SHORT_CLIP_BOOST
+        return weight
+
+    def _rebalance(self):
+        # caller holds `_lock`. Water-filling: a job whose weighted share
+        # exceeds its cap gets the cap, the others split what is left.
+        rates  = {}
+        active = dict(self._jobs)
+        budget = float(self.global_limit)
+        while active:
+            total_w = sum(entry[1] for entry in active.values())
+            capped  = {}
+            for jid, (job, weight, _bucket) in active.items():
+                cap = self.job_cap(job)
+                if cap and (not self.global_limit or budget * weight / total_w > cap):
+                    capped[jid] = cap
+            if not capped:
+                for jid, (_job, weight, _bucket) in active.items():
+                    rates[jid] = max(1.0, budget * weight / total_w) if self.global_limit else 0.0
+                break
+            for jid, cap in capped.items():
+                rates[jid] = cap
+                budget -= cap
+                del active[jid]
+        for jid, entry in self._jobs.items():
+            entry[2].set_rate(rates[jid])
+
+
+def parse_rate(text: str) -> int:
+    """'500K', '2M', '1.5m', '800000' → bytes/s ('0' = unlimited)."""
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kKmMgG]?)i?[bB]?\s*", text or "")
+    if not m:
+        raise ValueError(f"invalid rate: {text!r}")
+    scale = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}[m.group(2).lower()]
+    return int(float(m.group(1)) * scale)
+
+
+# ─────────────────────────────────────────────
+#  METRICS
+# ─────────────────────────────────────────────
+class JobMetrics:
+    """
+    Timings and throughput of one job. Phases are wall-clock seconds
+    (expand, dedup, extract, transfer, resolve); TTFB runs from the transfer
+    request to the first body byte.
+    """
+
+    def __init__(self):
+        self.t0            = time.perf_counter()
+        self.phases        = {}      # phase → seconds
+        self.engine        = ""      # yt-dlp / segmented / stream
+        self.extractor     = ""      # registry engine that produced the file
+        self.attempts      = []      # [{"engine", "ok", "latency_s"}] in try order
+        self.first_byte_at = None
+        self.cache_hit     = False
+        self.dedup_hit     = False
+        self.ttfb          = None
+        self.bytes         = 0       # transferred by this run
+        self.bytes_resumed = 0       # already on disk from an earlier run
+        self.retries       = 0
+        self.peak_bps      = 0.0
+        self._request_at   = None
+        self._win_start    = None
+        self._win_bytes    = 0
+        self._lock         = threading.Lock()   # segment threads report concurrently
+
+    @contextmanager
+    def phase(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - t0
+
+    def request_sent(self):
+        if self._request_at is None:
+            self._request_at = time.perf_counter()
+
+    def add_bytes(self, n: int):
+        now = time.perf_counter()
+        with self._lock:
+            if self.ttfb is None and self._request_at is not None:
+                self.ttfb = now - self._request_at
+            if self.first_byte_at is None:
+                self.first_byte_at = now
+            if self._win_start is None:
+                self._win_start = now
+            self.bytes      += n
+            self._win_bytes += n
+            elapsed = now - self._win_start
+            if elapsed >= PEAK_WINDOW:
+                self.peak_bps   = max(self.peak_bps, self._win_bytes / elapsed)
+                self._win_start = now
+                self._win_bytes = 0
+
+    def count_retries(self, response):
+        """Add urllib3's retry history for a `requests` response."""
+        retries = getattr(getattr(response, "raw", None), "retries", None)
+        if retries is not None:
+            self.retries += len(retries.history)
+
+    def to_record(self, job: DownloadJob) -> dict:
+        transfer = self.phases.get("transfer", 0.0)
+        avg_bps  = self.bytes / transfer if transfer > 0 else 0.0
+        return {
+            "ts":            round(time.time(), 3),
+            "app_version":   APP_VERSION,
+            "job":           job.id,
+            "platform":      job.platform,
+            "engine":        self.engine,
+            "extractor":     self.extractor,
+            "attempts":      self.attempts,
+            "ok":            job.state == JOB_DONE,
+            "cache_hit":     self.cache_hit,
+            "dedup_hit":     self.dedup_hit,
+            "total_s":       round(time.perf_counter() - self.t0, 3),
+            "phases":        {name: round(sec, 3) for name, sec in self.phases.items()},
+            "ttfb_s":        round(self.ttfb, 3) if self.ttfb is not None else None,
+            "bytes":         self.bytes,
+            "bytes_resumed": self.bytes_resumed,
+            "avg_bps":       round(avg_bps),
+            "peak_bps":      round(max(self.peak_bps, avg_bps)),
+            "retries":       self.retries,
+        }
+
+
+class MetricsLog:
+    """
+    Append-only JSON-lines log of JobMetrics records. The file is
+    rotated at METRICS_MAX_BYTES, keeping METRICS_BACKUPS old files.
+    """
+
+    _lock   = threading.Lock()
+    _recent = None   # platform → recent avg_bps, seeded from the file on first use
+
+    @classmethod
+    def write(cls, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with cls._lock:
+            if cls._recent is not None:
+                cls._remember(cls._recent, record)
+            try:
+                if (os.path.exists(METRICS_FILE)
+                        and os.path.getsize(METRICS_FILE) + len(line) > METRICS_MAX_BYTES):
+                    cls._rotate()
+                with open(METRICS_FILE, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as exc:
+                log(f"Metrics write error: {exc}", "WARN")
+
+    @staticmethod
+    def _rotate():
+        for i in range(METRICS_BACKUPS, 0, -1):
+            src = METRICS_FILE if i == 1 else f"{METRICS_FILE}.{i - 1}"
+            if os.path.exists(src):
+                os.replace(src, f"{METRICS_FILE}.{i}")
+
+    @classmethod
+    def read(cls) -> list:
+        """All records, oldest first (rotated files included)."""
+        paths = [f"{METRICS_FILE}.{i}" for i in range(METRICS_BACKUPS, 0, -1)]
+        paths.append(METRICS_FILE)
+        records = []
+        with cls._lock:
+            for path in paths:
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        for line in f:
+                            try:
+                                records.append(json.loads(line))
+                            except ValueError:
+                                continue   # torn last line after a crash
+                except OSError:
+                    continue
+        return records
+
+    @classmethod
+    def throughput(cls, platform: str) -> float:
+        """Median average speed (bytes/s) of recent jobs on `platform`; 0 if unknown."""
+        if cls._recent is None:
+            recent = {}
+            for rec in cls.read():
+                cls._remember(recent, rec)
+            cls._recent = recent
+        samples = cls._recent.get(platform)
+        return float(statistics.median(samples)) if samples else 0.0
+
+    @staticmethod
+    def _remember(recent: dict, record: dict):
+        if record.get("avg_bps") and record.get("bytes", 0) >= THROUGHPUT_MIN_BYTES:
+            samples = recent.setdefault(record.get("platform", "unknown"),
+                                        deque(maxlen=THROUGHPUT_SAMPLES))
+            samples.append(record["avg_bps"])
+
+    @classmethod
+    def summary(cls) -> list:
+        """Aggregates per (app version, platform), newest version first."""
+        groups = {}
+        for rec in cls.read():
+            key = (rec.get("app_version", "?"), rec.get("platform", "unknown"))
+            g = groups.get(key)
+            if g is None:
+                g = groups[key] = {
+                    "app_version": key[0], "platform": key[1],
+                    "jobs": 0, "ok": 0, "retries": 0, "cache_hits": 0,
+                    "dedup_hits": 0, "bytes": 0, "bytes_resumed": 0, "peak_bps": 0,
+                    "_extract": [], "_ttfb": [], "_avg": [],
+                }
+            g["jobs"]          += 1
+            g["ok"]            += bool(rec.get("ok"))
+            g["retries"]       += rec.get("retries", 0)
+            g["cache_hits"]    += bool(rec.get("cache_hit"))
+            g["dedup_hits"]    += bool(rec.get("dedup_hit"))
+            g["bytes"]         += rec.get("bytes", 0)
+            g["bytes_resumed"] += rec.get("bytes_resumed", 0)
+            g["peak_bps"]       = max(g["peak_bps"], rec.get("peak_bps", 0))
+            if "extract" in rec.get("phases", {}):
+                g["_extract"].append(rec["phases"]["extract"])
+            if rec.get("ttfb_s") is not None:
+                g["_ttfb"].append(rec["ttfb_s"])
+            if rec.get("avg_bps"):
+                g["_avg"].append(rec["avg_bps"])
+
+        result = []
+        for g in groups.values():
+            g["median_extract_s"] = cls._median(g.pop("_extract"))
+            g["median_ttfb_s"]    = cls._median(g.pop("_ttfb"))
+            g["median_avg_bps"]   = cls._median(g.pop("_avg"))
+            result.append(g)
+        result.sort(key=lambda g: g["platform"])
+        result.sort(key=lambda g: cls._version_key(g["app_version"]), reverse=True)
+        return result
+
+    @staticmethod
+    def _median(values: list) -> Optional[float]:
+        return round(statistics.median(values), 3) if values else None
+
+    @staticmethod
+    def _version_key(version: str) -> tuple:
+        return tuple(int(p) if p.isdigit() else 0 for p in version.split("."))
+
+
+class _YdlLogger:
+    """Keeps yt-dlp quiet (as before) while counting its retries."""
+
+    def __init__(self, metrics: JobMetrics):
+        self.metrics = metrics
+
+    def _count(self, msg: str):
+        if "Retrying" in msg:
+            self.metrics.retries += 1
+
+    debug   = _count
+    info    = _count
+    warning = _count
+
+    def error(self, msg: str):
+        pass   # surfaced by the DownloadError that follows
+
+
+# ─────────────────────────────────────────────
+#  FORMAT SELECTION
+# ─────────────────────────────────────────────
+@lru_cache(maxsize=1)
+def ffmpeg_path() -> Optional[str]:
+    """ffmpeg binary for the merge path; None on Android or when not installed."""
+    if IS_ANDROID or not FFMPEG_MERGE:
+        return None
+    path = shutil.which("ffmpeg")
+    log(f"ffmpeg: {path or 'not found — pre-muxed formats only'}")
+    return path
+
+
+class FormatPolicy:
+    """
+    Picks one pre-muxed (audio + video) format from an info dict's
+    `formats`, by policy:
+
+      best      the best stream, mp4 preferred ("best[ext=mp4]/best")
+      480p      best stream no taller than 480 px
+      50M       best stream whose (estimated) size fits in 50 MB
+      60s       best stream that downloads in ~60 s at `throughput`
+
+    When nothing fits, the smallest stream is used rather than failing.
+    """
+
+    def __init__(self, spec: str = DEFAULT_QUALITY):
+        self.spec = (spec or DEFAULT_QUALITY).strip().lower()
+        self.value = 0
+        m = re.fullmatch(r"(\d+)([ps])", self.spec)
+        if self.spec == "best":
+            self.mode = "best"
+        elif m:
+            self.mode  = "max_height" if m.group(2) == "p" else "target_time"
+            self.value = int(m.group(1))
+        else:
+            self.mode  = "max_filesize"
+            self.value = parse_rate(self.spec)   # same K/M/G suffixes; ValueError if bad
+        if self.mode != "best" and self.value <= 0:
+            raise ValueError(f"invalid quality: {spec!r}")
+
+    @property
+    def label(self) -> str:
+        return {
+            "best":         "Best",
+            "max_height":   f"≤{self.value}p",
+            "max_filesize": f"≤{format_bytes(self.value)}",
+            "target_time":  f"~{self.value} s",
+        }[self.mode]
+
+    @staticmethod
+    def estimate_size(fmt: dict, duration: Optional[float]) -> Optional[float]:
+        size = fmt.get("filesize") or fmt.get("filesize_approx")
+        if not size and fmt.get("tbr") and duration:
+            size = fmt["tbr"] * 1000 / 8 * duration   # tbr is in kbit/s
+        return size or None
+
+    @classmethod
+    def candidates(cls, formats: list) -> list:
+        """Pre-muxed formats, worst → best (yt-dlp's order), mp4 first if any."""
+        muxed = [f for f in formats
+                 if f.get("vcodec") != "none" and f.get("acodec") != "none"]
+        mp4 = [f for f in muxed if f.get("ext") == "mp4"]
+        return mp4 or muxed
+
+    def size_budget(self, throughput: float) -> float:
+        if self.mode == "max_filesize":
+            return float(self.value)
+        if self.mode == "target_time" and throughput > 0:
+            return throughput * self.value
+        return 0.0   # no size limit
+
+    def choose(self, formats: list, duration: Optional[float] = None,
+               throughput: float = 0.0) -> Optional[dict]:
+        pool = self.candidates(formats)
+        if not pool:
+            return formats[-1] if formats else None
+        budget = self.size_budget(throughput)
+        if self.mode == "max_height":
+            fits = [f for f in pool if (f.get("height") or 0) <= self.value]
+        elif budget:
+            fits = [f for f in pool
+                    if (self.estimate_size(f, duration) or float("inf")) <= budget]
+        else:
+            fits = pool
+        if fits:
+            return fits[-1]
+        # Nothing fits → smallest stream we can tell apart
+        return min(pool, key=lambda f: (f.get("height") or 0,
+                                        self.estimate_size(f, duration) or 0))
+
+    def choose_split(self, formats: list, duration: Optional[float] = None,
+                     throughput: float = 0.0) -> Optional[list]:
+        """
+        [video, audio] DASH pair for an ffmpeg remux, or None when a
+        pre-muxed stream is at least as tall (nothing to gain).
+        """
+        def rank(f):
+            return (f.get("height") or 0, f.get("tbr") or 0)
+
+        videos = sorted((f for f in formats
+                         if f.get("vcodec") not in (None, "none") and f.get("acodec") == "none"),
+                        key=rank)
+        audios = [f for f in formats
+                  if f.get("acodec") not in (None, "none") and f.get("vcodec") == "none"]
+        if not videos or not audios:
+            return None
+        # mp4 video + m4a audio copy straight into an .mp4 container
+        videos = [f for f in videos if f.get("ext") == "mp4"] or videos
+        audio  = max(audios, key=lambda f: (f.get("ext") == "m4a", f.get("abr") or f.get("tbr") or 0))
+        audio_size = self.estimate_size(audio, duration) or 0
+
+        budget = self.size_budget(throughput)
+        if self.mode == "max_height":
+            fits = [f for f in videos if (f.get("height") or 0) <= self.value]
+        elif budget:
+            fits = [f for f in videos
+                    if (self.estimate_size(f, duration) or float("inf")) + audio_size <= budget]
+        else:
+            fits = videos
+        if not fits:
+            return None   # the pre-muxed fallback picks the smallest stream
+
+        video = fits[-1]
+        muxed = self.choose(sorted(formats, key=rank), duration, throughput)
+        if muxed and (muxed.get("height") or 0) >= (video.get("height") or 0):
+            return None
+        return [video, audio]
+
+    @staticmethod
+    def merge_ext(video: dict, audio: dict) -> str:
+        if video.get("ext") == "mp4" and audio.get("ext") in ("m4a", "mp4"):
+            return "mp4"
+        if video.get("ext") == "webm" and audio.get("ext") == "webm":
+            return "webm"
+        return "mkv"
+
+
+# ─────────────────────────────────────────────
+#  YT-DLP POOL
+# ─────────────────────────────────────────────
+class YdlPool:
+    """
+    Long-lived yt_dlp.YoutubeDL instances, kept per platform (and base
+    options), so extractor instances, keep-alive connections and
+    YouTube's player JS / signature caches survive from job to job.
+
+    `lease()` hands an instance to one thread at a time and sets the
+    per-job options on it (YDL_JOB_OPTIONS). Instances are rebuilt
+    after YDL_POOL_MAX_USES leases or YDL_POOL_MAX_AGE seconds, or when
+    a lease ends in an error.
+    """
+
+    def __init__(self):
+        self._idle = {}   # key → [(ydl, hooks, uses, created)]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def lease(self, platform_name: str, opts: dict):
+        base = {k: v for k, v in opts.items() if k not in YDL_JOB_OPTIONS}
+        key  = (platform_name, json.dumps(base, sort_keys=True, default=repr))
+        ydl, hooks, uses, created = self._take(key, base)
+        self._configure(ydl, hooks, opts)
+        healthy = False
+        try:
+            yield ydl
+            healthy = True
+        except JobInterrupted:
+            healthy = True   # a pause / cancel says nothing about the instance
+            raise
+        finally:
+            self._configure(ydl, hooks, {})   # drop references to the job
+            uses += 1
+            if healthy and uses < YDL_POOL_MAX_USES and time.monotonic() - created < YDL_POOL_MAX_AGE:
+                with self._lock:
+                    idle = self._idle.setdefault(key, [])
+                    if len(idle) < YDL_POOL_IDLE:
+                        idle.append((ydl, hooks, uses, created))
+                        ydl = None
+            if ydl is not None:
+                ydl.close()
+
+    def clear(self):
+        with self._lock:
+            entries = [entry for idle in self._idle.values() for entry in idle]
+            self._idle.clear()
+        for ydl, *_rest in entries:
+            ydl.close()
+
+    def _take(self, key: tuple, base: dict) -> tuple:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+        import yt_dlp
+
+        hooks = []   # the current lease's progress hooks
+        ydl   = yt_dlp.YoutubeDL(dict(base))   # yt-dlp rewrites its params
+        ydl.add_progress_hook(lambda d: [hook(d) for hook in hooks])
+        log(f"New yt-dlp instance for {key[0]}", "INFO")
+        return ydl, hooks, 0, time.monotonic()
+
+    @staticmethod
+    def _configure(ydl, hooks: list, opts: dict):
+        fmt = opts.get("format")
+        ydl.params["format"] = fmt
+        ydl.format_selector  = (fmt if fmt is None or callable(fmt)
+                                else ydl.build_format_selector(fmt))
+        ydl.params["outtmpl"]["default"] = opts.get("outtmpl") or "%(id)s.%(ext)s"
+        ydl.params["logger"]    = opts.get("logger")
+        ydl.params["ratelimit"] = opts.get("ratelimit")
+        hooks[:] = opts.get("progress_hooks") or []
+
+
+YDL_POOL = YdlPool()
+
+
+# ─────────────────────────────────────────────
+#  EXTRACTORS
+# ─────────────────────────────────────────────
+class ExtractorRegistry:
+    """
+    Per-platform chains of download engines. An engine is a callable
+    `(DownloadEngine, job, url, save_path, platform) -> path`, with an
+    optional URL rule (regex) limiting what it accepts. Each platform
+    lists its preferred engine first, then its fallbacks.
+
+    The chain is reordered by recent results: engines below
+    EXTRACTOR_MIN_SUCCESS go last (until EXTRACTOR_COOLDOWN after their
+    last failure), and the remaining ones run fastest first by median
+    latency to the first byte. Engines with too few samples keep their
+    registered place behind the measured ones. Engines whose optional
+    dependency is missing (ImportError) are skipped for the session.
+    """
+
+    def __init__(self):
+        self._engines     = {}      # name → (fn, compiled rule or None)
+        self._chains      = {}      # platform → [engine names], preferred first
+        self._stats       = {}      # (platform, engine) → deque of (ok, latency_s, ts)
+        self._unavailable = set()
+        self._seeded      = False
+        self._lock        = threading.Lock()
+
+    def register_engine(self, name: str, fn, rule: Optional[str] = None):
+        self._engines[name] = (fn, re.compile(rule) if rule else None)
+
+    def register_platform(self, platform_name: str, chain: list):
+        unknown = [name for name in chain if name not in self._engines]
+        if unknown:
+            raise ValueError(f"Unknown extractor engine(s): {', '.join(unknown)}")
+        self._chains[platform_name] = list(chain)
+
+    def platforms(self) -> list:
+        return list(self._chains)
+
+    def chain(self, platform_name: str, url: str) -> list:
+        """Engine names to try for `url`, best candidate first."""
+        self._seed()
+        names = [
+            name for name in self._chains.get(platform_name, ())
+            if name not in self._unavailable
+            and (self._engines[name][1] is None or self._engines[name][1].search(url))
+        ]
+        with self._lock:
+            ranked = [(self._rank(platform_name, name), i, name) for i, name in enumerate(names)]
+        return [name for *_key, name in sorted(ranked)]
+
+    def run(self, platform_name: str, engine, job: DownloadJob, url: str, save_path: str) -> str:
+        """Try the chain in order; returns the first existing file, else raises the last error."""
+        names = self.chain(platform_name, url)
+        if not names:
+            raise ValueError(f"No extractor for {platform_name}")
+        metrics = job.metrics
+        error   = None
+        for i, name in enumerate(names):
+            fn, _rule = self._engines[name]
+            t0 = time.perf_counter()
+            metrics.first_byte_at = None
+            try:
+                path = fn(engine, job, url, save_path, platform_name)
+                if not path or not os.path.exists(path):
+                    raise FileNotFoundError("engine finished without a file")
+            except JobInterrupted:
+                raise
+            except ImportError as exc:
+                log(f"Extractor {name} unavailable: {exc}", "WARN")
+                self._unavailable.add(name)
+                continue
+            except Exception as exc:
+                error = exc
+                self.record(platform_name, name, False, time.perf_counter() - t0)
+                metrics.attempts.append({"engine": name, "ok": False, "latency_s": None})
+                log(f"Extractor {name} failed on {platform_name}: {exc}", "WARN")
+                if i < len(names) - 1:
+                    job.discard_partial()   # the next engine may pick another format
+                    job.target = ""
+                continue
+            latency = (metrics.first_byte_at or time.perf_counter()) - t0
+            self.record(platform_name, name, True, latency)
+            metrics.attempts.append({"engine": name, "ok": True, "latency_s": round(latency, 3)})
+            metrics.extractor = name
+            return path
+        if error is None:
+            raise ValueError(f"No extractor available for {platform_name}")
+        raise error
+
+    def record(self, platform_name: str, name: str, ok: bool, latency: float,
+               ts: Optional[float] = None):
+        with self._lock:
+            samples = self._stats.setdefault((platform_name, name),
+                                             deque(maxlen=EXTRACTOR_WINDOW))
+            samples.append((ok, latency, ts or time.time()))
+
+    def stats(self) -> list:
+        """Success rate and median latency per (platform, engine)."""
+        self._seed()
+        result = []
+        with self._lock:
+            for (platform_name, name), samples in sorted(self._stats.items()):
+                ok = [lat for good, lat, _ts in samples if good]
+                result.append({
+                    "platform":       platform_name,
+                    "engine":         name,
+                    "attempts":       len(samples),
+                    "success_rate":   round(len(ok) / len(samples), 3),
+                    "median_latency": round(statistics.median(ok), 3) if ok else None,
+                })
+        return result
+
+    def _rank(self, platform_name: str, name: str) -> tuple:
+        # caller holds `_lock`; sorts as (demoted, latency) — lower first
+        samples = self._stats.get((platform_name, name))
+        if not samples:
+            return (False, float("inf"))
+        ok   = [lat for good, lat, _ts in samples if good]
+        rate = len(ok) / len(samples)
+        last_failure = max((ts for good, _lat, ts in samples if not good), default=0)
+        demoted = (rate < EXTRACTOR_MIN_SUCCESS
+                   and time.time() - last_failure < EXTRACTOR_COOLDOWN)
+        latency = statistics.median(ok) if len(ok) >= EXTRACTOR_MIN_SAMPLES else float("inf")
+        return (demoted, latency)
+
+    def _seed(self):
+        """Load earlier attempts from the metrics log once, so rankings survive restarts."""
+        if self._seeded:
+            return
+        self._seeded = True
+        for rec in MetricsLog.read():
+            for attempt in rec.get("attempts") or ():
+                self.record(rec.get("platform", "unknown"), attempt.get("engine", ""),
+                            bool(attempt.get("ok")), attempt.get("latency_s") or 0.0,
+                            rec.get("ts"))
+
+
+EXTRACTORS = ExtractorRegistry()
+
+
+# ─────────────────────────────────────────────
+#  DOWNLOAD ENGINE
+# ─────────────────────────────────────────────
+_YT_TABS      = {"", "videos", "shorts", "streams", "featured"}
+_IG_NON_USERS = {"p", "reel", "reels", "tv", "stories", "explore", "accounts"}
+
+
+def is_collection(url: str) -> bool:
+    """Playlist, channel or profile URL (as opposed to a single video)."""
+    parts = urlsplit(normalize_url(url))
+    segs  = [seg for seg in parts.path.split("/") if seg]
+    if not segs:
+        return False
+    platform_name = detect_platform(url)
+    if platform_name == "YouTube":
+        if segs[0] == "playlist":
+            return True
+        if segs[0].startswith("@"):
+            return (segs[1] if len(segs) > 1 else "") in _YT_TABS
+        if segs[0] in ("channel", "c", "user") and len(segs) > 1:
+            return (segs[2] if len(segs) > 2 else "") in _YT_TABS
+        return False
+    if platform_name == "TikTok":
+        return len(segs) == 1 and segs[0].startswith("@")
+    if platform_name == "Instagram":
+        return len(segs) == 1 and segs[0] not in _IG_NON_USERS
+    return False
+
+
+class DownloadEngine:
+    """
+    Platform detection + yt-dlp / manual downloaders, with no UI.
+    Progress is reported only through `job.update(...)`, so the same
+    engine drives the Home screen rows and the batch-mode output.
+    """
+
+    def __init__(self, save_path: Optional[str] = None,
+                 bandwidth: Optional[BandwidthScheduler] = None,
+                 quality: str = DEFAULT_QUALITY):
+        self.save_path = save_path   # None → platform default
+        self.quality   = FormatPolicy(quality).spec   # default for jobs without one
+        self.bandwidth = bandwidth or BandwidthScheduler()
+        self.submit_many = None   # DownloadQueue.submit_many, for collection entries
+
+    # ── Save path ─────────────────────────────
+    def get_save_path(self) -> str:
+        if self.save_path:
+            path = self.save_path
+        elif IS_ANDROID:
+            from android.storage import primary_external_storage_path  # type: ignore
+            path = os.path.join(
+                primary_external_storage_path(), "Download", "ProDownloader"
+            )
+        else:
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "downloads")
+        os.makedirs(path, exist_ok=True)
+        log(f"Save path: {path}")
+        return path
+
+    # ── Job runner (download pool thread) ─────
+    def run(self, job: DownloadJob) -> Optional[dict]:
+        """Download `job`, keep it updated, and return its history record."""
+        metrics = job.metrics = JobMetrics()
+        job.update(message="Detecting platform…", progress=5)
+        with metrics.phase("expand"):
+            platform_name, video_id, url = resolve_url(job.url)
+        if is_collection(url):
+            self._run_collection(job, url)
+            return None
+
+        save_path     = self.get_save_path()
+        filepath      = ""
+        success       = False
+        record        = None
+        self.bandwidth.register(job)
+
+        try:
+            if platform_name not in EXTRACTORS.platforms():
+                job.update(state=JOB_FAILED, message="Unsupported platform!")
+                return None
+            download = partial(EXTRACTORS.run, platform_name, self, job, url, save_path)
+
+            job.update(platform=platform_name,
+                       video_id=video_id or DownloadIndex.video_id(url))
+
+            # ── Dedup: reuse an intact earlier download at this quality ──
+            quality = FormatPolicy(job.quality or self.quality).spec
+            with metrics.phase("dedup"):
+                filepath = DownloadIndex.lookup(url, platform_name, job.video_id, quality)
+            if filepath:
+                metrics.dedup_hit = True
+                log(f"Already downloaded: {filepath}", "OK")
+            else:
+                filepath = download()
+                if filepath and os.path.exists(filepath):
+                    DownloadIndex.record(url, platform_name, job.video_id, quality, filepath)
+
+            # ── Final file check ──────────────
+            if filepath and os.path.exists(filepath) and os.path.getsize(filepath) > 0:
+                mb = os.path.getsize(filepath) / (1024 * 1024)
+                success = True
+                job.update(
+                    state=JOB_DONE, filepath=filepath, progress=100,
+                    message=f"Done! Saved {mb:.1f} MB  ✓",
+                )
+                log(f"File ready: {filepath}  ({mb:.2f} MB)", "OK")
+            else:
+                job.update(state=JOB_FAILED, message="File missing or empty!")
+                log("File not found after download", "ERR")
+
+        except JobInterrupted as exc:
+            if exc.reason == "pause":
+                job.update(state=JOB_PAUSED, speed=0,
+                           message=f"Paused at {format_bytes(job.downloaded)}")
+            else:
+                job.discard_partial()
+                job.update(state=JOB_CANCELLED, speed=0, message="Cancelled")
+            log(f"Job #{job.id} {job.state}", "INFO")
+
+        except Exception as exc:
+            log(f"Worker error: {exc}", "ERR")
+            job.update(state=JOB_FAILED, error=str(exc), message=f"Error: {str(exc)[:70]}")
+
+        finally:
+            self.bandwidth.unregister(job)
+            if job.state not in (JOB_PAUSED, JOB_CANCELLED):
+                record = HistoryManager.add(url, platform_name, filepath, success)
+                MetricsLog.write(metrics.to_record(job))
+        return record
+
+    # ─────────────────────────────────────────
+    #  Playlists, channels and profiles
+    #  ─────────────────────────────────────────
+    #  Only the entry list is extracted here (extract_flat, one
+    #  paginated listing instead of a full extraction per video).
+    #  Each new entry becomes its own job, so per-video extraction
+    #  and download spread over the worker pool; the collection job
+    #  tracks their combined progress (DownloadQueue._roll_up).
+    # ─────────────────────────────────────────
+    def _run_collection(self, job: DownloadJob, url: str):
+        if self.submit_many is None:
+            job.update(state=JOB_FAILED, message="Collections need a download queue")
+            return
+        platform_name = detect_platform(url)
+        quality       = FormatPolicy(job.quality or self.quality).spec
+        job.update(platform=platform_name, message="Listing collection…", progress=2)
+
+        import yt_dlp
+
+        ydl_opts = {
+            "quiet": True,
+            "no_warnings": True,
+            "extract_flat": "in_playlist",
+            "playlistend": COLLECTION_MAX_ENTRIES,
+            "socket_timeout": 30,
+            "http_headers": dict(HTTP_HEADERS),
+        }
+        t0 = time.perf_counter()
+        try:
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(url, download=False)
+        except Exception as exc:
+            log(f"Collection listing failed: {exc}", "ERR")
+            job.update(state=JOB_FAILED, error=str(exc), message=f"Error: {str(exc)[:70]}")
+            return
+        entries = list(self._flat_entries(info))
+        log(f"Listed {len(entries)} entries in {time.perf_counter() - t0:.1f}s: {url}", "INFO")
+
+        seen, urls, skipped = set(), [], 0
+        for entry in entries:
+            entry_url = entry.get("url") or entry.get("webpage_url") or ""
+            if not entry_url.startswith(("http://", "https://")):
+                continue
+            video_id = str(entry.get("id") or DownloadIndex.video_id(entry_url))
+            key      = video_id or normalize_url(entry_url)
+            if key in seen:
+                continue
+            seen.add(key)
+            if DownloadIndex.lookup(entry_url, platform_name, video_id, quality):
+                skipped += 1
+                continue
+            urls.append(entry_url)
+
+        job.title = info.get("title") or info.get("uploader") or "Collection"
+        if not urls:
+            job.update(
+                state=JOB_DONE, progress=100,
+                message=f"{job.title}: nothing new ({skipped} already downloaded)",
+            )
+            return
+        log(f"Collection '{job.title}': {len(urls)} new, {skipped} already downloaded", "OK")
+        self.submit_many(urls, job.priority, parent=job, quality=job.quality)
+
+    @classmethod
+    def _flat_entries(cls, info: dict):
+        """Video entries of a flat listing (channel tabs are nested playlists)."""
+        for entry in info.get("entries") or []:
+            if not entry:
+                continue
+            if entry.get("_type") == "playlist":
+                yield from cls._flat_entries(entry)
+            elif entry.get("ie_key") not in ("YoutubeTab", "YoutubePlaylist"):
+                yield entry
+
+    # ─────────────────────────────────────────
+    #  TikTok downloader (via yt-dlp)
+    # ─────────────────────────────────────────
+    def _dl_tiktok_api(self, job: DownloadJob, url: str, save_path: str, label: str) -> str:
+        """
+        Fast path: a direct-media API from the optional `tiktok-downloader`
+        package hands back the no-watermark MP4 URL, skipping yt-dlp's
+        extraction; the file itself goes through _manual_download.
+        """
+        import tiktok_downloader   # optional; ImportError drops this engine
+
+        video_id = url_video_id(url)
+        if not video_id:
+            raise ValueError("no video id in URL")
+        job.update(message=f"Fetching {label} data…", progress=15)
+        with job.metrics.phase("extract"):
+            media = getattr(tiktok_downloader, TIKTOK_API_SERVICE)(url)
+        videos = [m for m in media if m.type == "video" and not m.watermark]
+        if not videos:
+            raise ValueError(f"{TIKTOK_API_SERVICE} returned no video")
+        path = os.path.join(save_path, f"{label.lower()}_{video_id}.mp4")
+        self._manual_download(job, videos[0].json, path)
+        return path
+
+    # ─────────────────────────────────────────
+    #  YouTube & Instagram via yt-dlp
+    #  ─────────────────────────────────────────
+    #  KEY FIX: pre-muxed formats only
+    #  ───────────────────────────────────────
+    #  "bestvideo+bestaudio" triggers a POST-PROCESS
+    #  merge step that requires ffmpeg.  If ffmpeg is
+    #  absent, yt-dlp's FileMergerPP tries to open the
+    #  output template string as a file object →
+    #  "'str' object has no attribute 'write'" crash.
+    #
+    #  The format is chosen by FormatPolicy (a callable
+    #  yt-dlp format selector) among single pre-muxed
+    #  streams — no merge, no ffmpeg, no crash.
+    # ─────────────────────────────────────────
+    def _dl_ytdlp(self, job: DownloadJob, url: str, save_path: str, label: str) -> str:
+        job.update(message=f"Connecting to {label}…", progress=15)
+
+        # Use %(id)s not %(title)s — titles can contain /:\\ etc.
+        out_tmpl = os.path.join(save_path, f"{label.lower()}_%(id)s.%(ext)s")
+
+        # Read by the format selector, which runs inside yt-dlp
+        result = {"duration": None}
+        job.target = job.target or out_tmpl
+
+        metrics = job.metrics = job.metrics or JobMetrics()
+        metrics.engine = "yt-dlp"
+        seen    = {}   # tmp file → bytes already counted
+        streams = {}   # tmp file → (done, total, speed); summed when video + audio run at once
+
+        def _hook(d: dict):
+            status = d.get("status", "")
+            if status == "downloading":
+                done  = d.get("downloaded_bytes") or 0
+                total = d.get("total_bytes") or d.get("total_bytes_estimate") or 0
+                speed = d.get("speed") or 0
+                key   = d.get("tmpfilename") or d.get("filename")
+                if key not in seen:
+                    job.target = d.get("filename") or job.target
+                    job.partials.add(job.target)
+                    # yt-dlp counts a resumed .part as already downloaded
+                    resumed = done - int(speed * (d.get("elapsed") or 0))
+                    seen[key] = resumed if resumed > CHUNK_SIZE else 0
+                    metrics.bytes_resumed += seen[key]
+                if done > seen[key]:
+                    metrics.add_bytes(done - seen[key])
+                    self.bandwidth.consume(job, done - seen[key])   # sleeps off any debt
+                    seen[key] = done
+                streams[key] = (done, total, speed)
+                done, total, speed = (sum(col) for col in zip(*streams.values()))
+                pct   = min(100.0, done * 100.0 / total) if total else 0.0
+                job.update(
+                    progress=15 + int(pct * 0.75),   # 15 → 90
+                    downloaded=done, total_bytes=total, speed=speed,
+                    message=(
+                        f"{label}: {pct:.0f}%  {format_bytes(speed)}/s  "
+                        f"ETA {format_eta(d.get('eta'))}"
+                    ),
+                )
+            elif status == "finished":
+                log(f"yt-dlp finished: {d.get('filename')}", "INFO")
+            # After the progress fields, so a pause journals the real offset.
+            # Propagates out of yt-dlp; the .part file stays
+            job.check_stop()
+
+        ydl_opts = {
+            "format": self._format_selector(job, label, result),
+            "noplaylist": True,   # watch?v=…&list=… → just this video
+            "outtmpl": out_tmpl,
+            "quiet": True,
+            "no_warnings": True,
+            "logger": _YdlLogger(metrics),
+            "progress_hooks": [_hook],
+            "ratelimit": self.bandwidth.job_cap(job) or None,   # shared rate via _hook
+            "retries": 5,
+            "fragment_retries": 5,
+            "concurrent_fragment_downloads": FRAGMENT_CONCURRENCY,
+            "socket_timeout": 30,
+            "cookiefile": None,
+            "cookiesfrombrowser": None,
+            "nocheckcertificate": True,
+            "age_limit": 99,
+            "http_headers": dict(HTTP_HEADERS),
+        }
+
+        import yt_dlp
+
+        with YDL_POOL.lease(label, ydl_opts) as ydl:
+            log(f"yt-dlp starting → {label}", "INFO")
+            info = InfoCache.get(url)
+            cached = info is not None
+            if cached:
+                log("Info cache hit — skipping extraction", "INFO")
+                metrics.cache_hit = True
+            else:
+                info = self._extract(job, ydl, url, label)
+            result["duration"] = info.get("duration")
+            job.video_id = str(info.get("id") or job.video_id)
+
+            merged = self._dl_merged(job, ydl, ydl_opts, info, label)
+            if merged:
+                return merged
+
+            try:
+                metrics.request_sent()
+                with metrics.phase("transfer"):
+                    done = ydl.process_ie_result(info, download=True)
+            except yt_dlp.utils.DownloadError as exc:
+                if not cached:
+                    raise
+                # Usually expired/revoked media URLs → extract afresh
+                log(f"Cached info failed ({exc}); re-extracting", "WARN")
+                InfoCache.invalidate(url)
+                metrics.retries += 1
+                info = self._extract(job, ydl, url, label)
+                result["duration"] = info.get("duration")
+                with metrics.phase("transfer"):
+                    done = ydl.process_ie_result(info, download=True)
+
+            with metrics.phase("resolve"):
+                path = self._output_path(ydl, done)
+        job.update(progress=93)
+        return path
+
+    @staticmethod
+    def _extract(job: DownloadJob, ydl, url: str, label: str) -> dict:
+        job.update(message=f"Extracting {label} info…")
+        with job.metrics.phase("extract"):
+            info = ydl.extract_info(url, download=False, process=False)
+            InfoCache.put(url, ydl, info)
+        return info
+
+    # ─────────────────────────────────────────
+    #  DASH video + audio → ffmpeg remux (desktop)
+    #  ─────────────────────────────────────────
+    #  Only when an ffmpeg binary is present. Both streams download
+    #  at the same time (each with parallel fragments), then ffmpeg
+    #  copies them into one container without re-encoding. Any
+    #  failure falls back to the pre-muxed path above.
+    # ─────────────────────────────────────────
+    def _dl_merged(self, job: DownloadJob, ydl, ydl_opts: dict, info: dict,
+                   label: str) -> Optional[str]:
+        ffmpeg = ffmpeg_path()
+        if not ffmpeg or not info.get("formats"):
+            return None
+        import yt_dlp
+
+        formats  = info["formats"]
+        by_id    = {f.get("format_id"): f for f in formats}
+        resumed  = [by_id.get(fid) for fid in job.format.split("+")] if "+" in job.format else None
+        if resumed and all(resumed):
+            split = resumed
+        elif job.format:
+            return None   # resuming a pre-muxed stream
+        else:
+            policy = FormatPolicy(job.quality or self.quality)
+            split  = policy.choose_split(formats, info.get("duration"), self._throughput(job, label))
+        if not split:
+            return None
+
+        video, audio = split
+        job.format   = f"{video['format_id']}+{audio['format_id']}"
+        metrics      = job.metrics
+        metrics.engine = "yt-dlp+ffmpeg"
+        out_path     = ydl.prepare_filename(dict(info, ext=FormatPolicy.merge_ext(video, audio)))
+        stream_tmpl  = os.path.splitext(ydl_opts["outtmpl"])[0] + ".f%(format_id)s.%(ext)s"
+        tmp_path     = out_path + ".merging" + os.path.splitext(out_path)[1]
+        finished     = []   # complete stream files, removed once merged or abandoned
+        log(f"DASH {video.get('height') or '?'}p {job.format} → ffmpeg remux", "INFO")
+
+        def _fetch(fmt: dict) -> str:
+            opts = dict(ydl_opts, format=fmt["format_id"], outtmpl=stream_tmpl)
+            with YDL_POOL.lease(label, opts) as stream_ydl:
+                done = stream_ydl.process_ie_result(copy.deepcopy(info), download=True)
+            path = self._output_path(stream_ydl, done)
+            finished.append(path)
+            return path
+
+        def _discard(paths: list):
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+        try:
+            metrics.request_sent()
+            with metrics.phase("transfer"), ThreadPoolExecutor(max_workers=2) as pool:
+                video_path, audio_path = pool.map(_fetch, split)
+
+            job.update(message="Merging video + audio…", progress=91)
+            with metrics.phase("merge"):
+                subprocess.run(
+                    [ffmpeg, "-y", "-loglevel", "error",
+                     "-i", video_path, "-i", audio_path,
+                     "-map", "0:v:0", "-map", "1:a:0", "-c", "copy", tmp_path],
+                    check=True, capture_output=True, timeout=FFMPEG_TIMEOUT,
+                )
+            os.replace(tmp_path, out_path)
+        except (yt_dlp.utils.DownloadError, subprocess.SubprocessError, OSError, KeyError) as exc:
+            detail = getattr(exc, "stderr", b"") or b""
+            log(f"DASH merge failed ({exc} {detail.decode(errors='replace')[:120]}); "
+                f"falling back to pre-muxed", "WARN")
+            _discard(finished + [tmp_path])
+            job.format = ""
+            return None
+
+        _discard(finished)
+        job.update(progress=93)
+        log(f"Merged → {out_path}", "OK")
+        return out_path
+
+    def _format_selector(self, job: DownloadJob, platform_name: str, result: dict):
+        """yt-dlp `format` callable applying the job's FormatPolicy."""
+        policy = FormatPolicy(job.quality or self.quality)
+
+        def _select(ctx: dict):
+            formats = ctx.get("formats") or []
+            # A resumed job keeps the stream its .part file belongs to
+            fmt = next((f for f in formats if job.format and f.get("format_id") == job.format), None)
+            if fmt is None:
+                fmt = policy.choose(formats, result["duration"],
+                                    self._throughput(job, platform_name))
+            if fmt is None:
+                return
+            job.format = fmt.get("format_id") or ""
+            size = policy.estimate_size(fmt, result["duration"])
+            log(f"Format {job.format} ({fmt.get('height') or '?'}p, "
+                f"~{format_bytes(size) if size else '? MB'}) for quality '{policy.spec}'")
+            yield fmt
+
+        return _select
+
+    def _throughput(self, job: DownloadJob, platform_name: str) -> float:
+        """Expected bytes/s: recent measurements, capped by the job's limit."""
+        throughput = MetricsLog.throughput(platform_name)
+        cap = self.bandwidth.job_cap(job)
+        if cap:
+            throughput = min(throughput, cap) if throughput else cap
+        return throughput
+
+    @staticmethod
+    def _output_path(ydl, info: dict) -> str:
+        """
+        Final file of a processed info dict, straight from yt-dlp: the
+        path it recorded for the download (after post-processing), or
+        the one its output template yields. Never scans the directory,
+        so concurrent jobs in one folder always get their own file.
+        """
+        for download in info.get("requested_downloads") or ():
+            if download.get("filepath"):
+                return download["filepath"]
+        return info.get("filepath") or ydl.prepare_filename(info)
+
+    # ─────────────────────────────────────────
+    #  Manual byte-stream download (fallback)
+    # ─────────────────────────────────────────
+    def _manual_download(self, job: DownloadJob, url: str, path: str,
+                         base_progress: int = 20, progress_span: int = 70):
+        log(f"Manual download: {url[:65]}…", "INFO")
+        job.target = path
+        job.partials.add(path)
+        metrics = job.metrics or JobMetrics()
+        with metrics.phase("transfer"):
+            self._stream_download(job, metrics, url, path, base_progress, progress_span)
+
+    def _stream_download(self, job: DownloadJob, metrics: JobMetrics, url: str, path: str,
+                         base_progress: int, progress_span: int):
+
+        temp_path = path + ".part"
+        os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+
+        # Handle stale .part files with wrong permissions (e.g. from sudo runs)
+        if os.path.exists(temp_path) and not os.access(temp_path, os.W_OK):
+            try:
+                os.remove(temp_path)
+                log("Removed stale .part file (wrong permissions)", "WARN")
+            except OSError:
+                raise PermissionError(
+                    f"Cannot write to {os.path.basename(temp_path)}. "
+                    f"Run: sudo rm '{temp_path}'"
+                )
+
+        # ── Segmented mode (fresh start, or resume via its manifest) ──
+        manifest_path = temp_path + ".json"
+        if os.path.exists(manifest_path) or not os.path.exists(temp_path):
+            total = self._probe_ranges(url)
+            if total >= 2 * MIN_SEGMENT_SIZE:
+                try:
+                    self._segmented_download(
+                        job, metrics, url, path, total, base_progress, progress_span
+                    )
+                    return
+                except RangeNotSupported as exc:
+                    log(f"Segmented mode unavailable ({exc}); using one stream", "WARN")
+            # The server answered without ranges (or with a new size). A
+            # segmented .part is preallocated — never resume it as one stream
+            for stale in (manifest_path, temp_path):
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+        existing = os.path.getsize(temp_path) if os.path.exists(temp_path) else 0
+        headers = {}
+        if existing:
+            headers["Range"] = f"bytes={existing}-"
+            log(f"Resuming from byte {existing}", "INFO")
+
+        metrics.engine = "stream"
+        metrics.request_sent()
+        r = http_session().get(url, stream=True, headers=headers, timeout=60)
+        metrics.count_retries(r)
+
+        if existing and r.status_code == 416:
+            os.replace(temp_path, path)
+            log("Partial file already complete (HTTP 416)", "OK")
+            return
+
+        if existing and r.status_code == 200:
+            # Server ignored byte range → start fresh
+            log("Server ignored Range header; restarting download", "WARN")
+            existing = 0
+            headers.pop("Range", None)
+            r.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            r = http_session().get(url, stream=True, headers=headers, timeout=60)
+            metrics.count_retries(r)
+
+        r.raise_for_status()
+
+        content_length = r.headers.get("content-length")
+        remainder = int(content_length) if content_length and content_length.isdigit() else 0
+        total = existing + remainder if remainder else 0
+
+        mode = "ab" if existing and r.status_code == 206 else "wb"
+        if mode == "wb" and os.path.exists(temp_path):
+            os.remove(temp_path)
+        if mode == "ab":
+            metrics.bytes_resumed += existing
+
+        done   = existing
+        shown  = 0.0
+        with r, open(temp_path, mode, buffering=WRITE_BUFFER_SIZE) as f:
+            syncer = FsyncBatcher(f)
+            for chunk in ChunkReader(r):
+                job.check_stop()
+                n = len(chunk)
+                f.write(chunk)
+                syncer.add(n)
+                done += n
+                metrics.add_bytes(n)
+                self.bandwidth.consume(job, n)
+                now = time.monotonic()
+                if total and now - shown >= 1 / PROGRESS_FLUSH_HZ:
+                    shown = now
+                    pct = base_progress + int((done / total) * progress_span)
+                    job.update(progress=min(base_progress + progress_span, pct),
+                               downloaded=done, total_bytes=total)
+            syncer.sync()
+        if total and done != total:
+            # Keep the .part: the next attempt resumes from what arrived
+            raise IOError(f"Incomplete download: got {done} of {total} bytes")
+        if total:
+            job.update(progress=base_progress + progress_span, downloaded=done,
+                       total_bytes=total)
+
+        os.replace(temp_path, path)
+        log("Manual download complete", "OK")
+
+    @staticmethod
+    def _probe_ranges(url: str) -> int:
+        """
+        Return the file size if the server honours byte ranges, else 0.
+        Network and HTTP errors propagate: they say nothing about range
+        support, and a 0 here discards a segmented .part.
+        """
+        headers = {"Range": "bytes=0-0"}
+        with http_session().get(url, stream=True, headers=headers, timeout=30) as r:
+            r.raise_for_status()
+            if r.status_code != 206:
+                return 0
+            m = re.match(r"bytes\s+0-0/(\d+)", r.headers.get("content-range", ""))
+        return int(m.group(1)) if m else 0
+
+    @staticmethod
+    def _load_manifest(manifest_path: str, temp_path: str, total: int) -> Optional[dict]:
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("size") != total or not manifest.get("segments"):
+            return None
+        if not os.path.exists(temp_path) or os.path.getsize(temp_path) != total:
+            return None
+        return manifest
+
+    @staticmethod
+    def _write_at(f, data, offset: int):
+        """Positional write: os.pwrite where available, seek+write otherwise."""
+        if not hasattr(os, "pwrite"):
+            f.seek(offset)
+            f.write(data)
+            return
+        view = memoryview(data)
+        while view:
+            n = os.pwrite(f.fileno(), view, offset)
+            view   = view[n:]
+            offset += n
+
+    def _segmented_download(self, job: DownloadJob, metrics: JobMetrics, url: str,
+                            path: str, total: int, base_progress: int, progress_span: int):
+        """
+        Fetch `total` bytes as parallel byte ranges into a preallocated
+        .part file. Per-segment progress lives in a `.part.json` manifest
+        so an interrupted download resumes each range where it stopped.
+        """
+        temp_path     = path + ".part"
+        manifest_path = temp_path + ".json"
+
+        manifest = self._load_manifest(manifest_path, temp_path, total)
+        if manifest is None:
+            count = max(2, min(SEGMENT_COUNT, total // MIN_SEGMENT_SIZE))
+            step  = total // count
+            manifest = {
+                "url":  url,
+                "size": total,
+                "segments": [
+                    {
+                        "start": i * step,
+                        "end":   (total if i == count - 1 else (i + 1) * step) - 1,
+                        "done":  0,
+                    }
+                    for i in range(count)
+                ],
+            }
+            with open(temp_path, "wb") as f:
+                f.truncate(total)   # preallocate
+            log(f"Segmented download: {count} ranges, {total} bytes", "INFO")
+        else:
+            log(f"Resuming {len(manifest['segments'])} segments from manifest", "INFO")
+
+        segments = manifest["segments"]
+        state    = {"done": sum(seg["done"] for seg in segments), "saved_at": 0.0,
+                    "shown": 0.0}
+        metrics.engine         = "segmented"
+        metrics.bytes_resumed += state["done"]
+        lock     = threading.Lock()
+        stop     = threading.Event()
+
+        def _save_manifest(force: bool = False):
+            # caller holds `lock`
+            now = time.monotonic()
+            if not force and now - state["saved_at"] < 1.0:
+                return
+            state["saved_at"] = now
+            tmp = manifest_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            os.replace(tmp, manifest_path)
+
+        def _fetch(seg: dict):
+            pos = seg["start"] + seg["done"]
+            if pos > seg["end"]:
+                return
+            headers = {"Range": f"bytes={pos}-{seg['end']}"}
+            metrics.request_sent()
+            with http_session().get(url, stream=True, headers=headers, timeout=60) as r:
+                metrics.count_retries(r)
+                if r.status_code != 206:
+                    raise RangeNotSupported(f"HTTP {r.status_code} for a range request")
+                with open(temp_path, "r+b") as f:
+                    syncer = FsyncBatcher(f)
+                    for chunk in ChunkReader(r):
+                        if stop.is_set():
+                            return
+                        job.check_stop()
+                        chunk = chunk[: seg["end"] + 1 - pos]
+                        n = len(chunk)
+                        self._write_at(f, chunk, pos)
+                        syncer.add(n)
+                        pos += n
+                        metrics.add_bytes(n)
+                        self.bandwidth.consume(job, n)
+                        now = time.monotonic()
+                        with lock:
+                            seg["done"]   += n
+                            state["done"] += n
+                            done = state["done"]
+                            _save_manifest()
+                            show = now - state["shown"] >= 1 / PROGRESS_FLUSH_HZ or done == total
+                            if show:
+                                state["shown"] = now
+                        if show:
+                            job.update(progress=base_progress + int(done / total * progress_span),
+                                       downloaded=done, total_bytes=total)
+                        if pos > seg["end"]:
+                            break
+                    syncer.sync()
+            if pos <= seg["end"]:
+                raise IOError(f"Segment {seg['start']}-{seg['end']} ended early at {pos}")
+
+        with lock:
+            _save_manifest(force=True)
+        try:
+            with ThreadPoolExecutor(max_workers=len(segments)) as pool:
+                futures = [pool.submit(_fetch, seg) for seg in segments]
+                try:
+                    for fut in as_completed(futures):
+                        fut.result()
+                except BaseException:
+                    stop.set()
+                    raise
+        finally:
+            # Only once the pool has exited, so no segment writes after it
+            with lock:
+                _save_manifest(force=True)
+            job.update(downloaded=state["done"], total_bytes=total)
+
+        os.remove(manifest_path)
+        os.replace(temp_path, path)
+        log("Segmented download complete", "OK")
+
+
+EXTRACTORS.register_engine("yt-dlp", DownloadEngine._dl_ytdlp)
+EXTRACTORS.register_engine("tiktok-api", DownloadEngine._dl_tiktok_api, rule=r"/video/\d+")
+EXTRACTORS.register_platform("TikTok", ["tiktok-api", "yt-dlp"])
+EXTRACTORS.register_platform("YouTube", ["yt-dlp"])
+EXTRACTORS.register_platform("Instagram", ["yt-dlp"])
+
+
+# ─────────────────────────────────────────────
+#  SERVICE IPC (Android download service ↔ UI)
+# ─────────────────────────────────────────────
+_SNAPSHOT_FIELDS = ("url", "priority", "state", "platform", "progress", "message", "filepath",
+                    "error", "downloaded", "total_bytes", "speed", "quality", "title")
+_SUBMIT_FIELDS   = ("quality", "rate_limit")   # what a client may set on new jobs
+
+
+def job_snapshot(job: DownloadJob) -> dict:
+    snap = {key: getattr(job, key) for key in _SNAPSHOT_FIELDS}
+    snap["id"]     = job.id
+    snap["parent"] = job.parent.id if job.parent else None
+    return snap
+
+
+class QueueServer:
+    """
+    Serves a DownloadQueue to the UI over a localhost socket, one JSON
+    object per line. The listening port and a random token are written
+    to SERVICE_TOKEN_FILE (app-private, so other apps on the device can't
+    drive the queue) once the socket is bound; binding errors raise here.
+    A client opens with {"cmd": "hello", "token": …}. It then gets a "session"
+    event, a "job" event per existing job and afterwards one per change
+    (coalesced at PROGRESS_FLUSH_HZ), plus "history" per saved download.
+    Commands: submit, pause, resume, cancel, clear_finished.
+    """
+
+    def __init__(self, dl_queue: DownloadQueue, port: int = SERVICE_PORT):
+        self.queue    = dl_queue
+        self.token    = secrets.token_hex(16)
+        self.session  = secrets.token_hex(4)
+        self.progress = ProgressAggregator(self._send_jobs)
+        self._clients = set()
+        self._lock    = threading.Lock()   # serialises writes to every client
+        self._server  = socket.create_server(("127.0.0.1", port))
+        self.port     = self._server.getsockname()[1]
+        tmp = SERVICE_TOKEN_FILE + ".tmp"
+        fd  = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(f"{self.port} {self.token}")
+        os.replace(tmp, SERVICE_TOKEN_FILE)
+
+    @property
+    def clients(self) -> int:
+        return len(self._clients)
+
+    def job_changed(self, job: DownloadJob):
+        self.progress.push(job)
+
+    def history_added(self, record: dict):
+        self._broadcast([{"event": "history", "record": record}])
+
+    def serve_forever(self):
+        self.progress.start()
+        log(f"Queue server listening on 127.0.0.1:{self.port}", "OK")
+        while True:
+            conn, _addr = self._server.accept()
+            threading.Thread(target=self._serve, args=(conn,), name="queue-server-client",
+                             daemon=True).start()
+
+    def _serve(self, conn: socket.socket):
+        with conn, conn.makefile("r", encoding="utf-8") as lines:
+            try:
+                hello = json.loads(lines.readline() or "{}")
+            except (OSError, ValueError):
+                return
+            if hello.get("cmd") != "hello" or not secrets.compare_digest(
+                    str(hello.get("token", "")), self.token):
+                log("Rejected a queue client (bad token)", "WARN")
+                return
+            with self._lock:
+                snapshot = [{"event": "session", "id": self.session}]
+                snapshot += [{"event": "job", "job": job_snapshot(job)}
+                             for job in list(self.queue.jobs.values())]
+                self._write(conn, snapshot)
+                self._clients.add(conn)
+            try:
+                for line in lines:
+                    try:
+                        self._command(json.loads(line))
+                    except (ValueError, TypeError, KeyError) as exc:
+                        log(f"Bad queue command: {exc}", "WARN")
+            except OSError:
+                pass
+            finally:
+                with self._lock:
+                    self._clients.discard(conn)
+
+    def _command(self, msg: dict):
+        cmd = msg["cmd"]
+        if cmd == "submit":
+            fields = {key: msg[key] for key in _SUBMIT_FIELDS if key in msg}
+            self.queue.submit_many([str(url) for url in msg["urls"]],
+                                   int(msg.get("priority", PRIORITY_NORMAL)), **fields)
+        elif cmd in ("pause", "resume", "cancel"):
+            getattr(self.queue, cmd)(int(msg["job"]))
+        elif cmd == "clear_finished":
+            removed = self.queue.clear_finished()
+            self._broadcast([{"event": "removed", "jobs": [job.id for job in removed]}])
+        else:
+            raise ValueError(f"unknown command {cmd!r}")
+
+    def _send_jobs(self, jobs: list):
+        self._broadcast([{"event": "job", "job": job_snapshot(job)} for job in jobs])
+
+    def _broadcast(self, messages: list):
+        with self._lock:
+            for conn in list(self._clients):
+                try:
+                    self._write(conn, messages)
+                except OSError:
+                    self._clients.discard(conn)
+
+    @staticmethod
+    def _write(conn: socket.socket, messages: list):
+        # caller holds `_lock`
+        data = "".join(json.dumps(m, ensure_ascii=False) + "\n" for m in messages)
+        conn.sendall(data.encode("utf-8"))
+
+
+class QueueClient:
+    """
+    DownloadQueue stand-in for the UI process while downloads run in the
+    service. `jobs` mirrors the server's jobs (same ids and parent /
+    children links) and calls become commands. Commands issued while
+    disconnected wait in an outbox; the connection is retried every
+    SERVICE_RETRY seconds, calling `start_service()` first so a killed
+    service comes back. The port and token come from SERVICE_TOKEN_FILE. A restarted service (new session) drops the
+    mirror and calls `on_reset()`.
+    """
+
+    journal = None   # the service restores and keeps its own journal
+
+    def __init__(self, on_change=None, on_history=None, on_reset=None,
+                 start_service=None):
+        self.jobs           = {}
+        self.on_change      = on_change
+        self.on_history     = on_history
+        self.on_reset       = on_reset
+        self._start_service = start_service
+        self._session       = None
+        self._sock          = None
+        self._outbox        = []
+        self._lock          = threading.Lock()
+        threading.Thread(target=self._run, name="queue-client", daemon=True).start()
+
+    def submit(self, url: str, priority: int = PRIORITY_NORMAL, **fields):
+        self.submit_many([url], priority, **fields)
+
+    def submit_many(self, urls: list, priority: int = PRIORITY_NORMAL, **fields):
+        self._send(dict(fields, cmd="submit", urls=list(urls), priority=priority))
+
+    def pause(self, job_id: int) -> bool:
+        return self._command("pause", job_id)
+
+    def resume(self, job_id: int) -> bool:
+        return self._command("resume", job_id)
+
+    def cancel(self, job_id: int) -> bool:
+        return self._command("cancel", job_id)
+
+    def clear_finished(self) -> list:
+        removed = [job for job in list(self.jobs.values()) if job.finished]
+        for job in removed:
+            self.jobs.pop(job.id, None)
+        self._send({"cmd": "clear_finished"})
+        return removed
+
+    def counts(self) -> dict:
+        counts = {}
+        for job in list(self.jobs.values()):
+            counts[job.state] = counts.get(job.state, 0) + 1
+        return counts
+
+    def _command(self, cmd: str, job_id: int) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        self._send({"cmd": cmd, "job": job_id})
+        return True
+
+    def _send(self, msg: dict):
+        line = (json.dumps(msg, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            if self._sock is not None:
+                try:
+                    self._sock.sendall(line)
+                    return
+                except OSError:
+                    pass   # the reader thread sees it too and reconnects
+            self._outbox.append(line)
+
+    def _run(self):
+        while True:
+            try:
+                with open(SERVICE_TOKEN_FILE, "r", encoding="utf-8") as f:
+                    port, token = f.read().split()
+                sock = socket.create_connection(("127.0.0.1", int(port)), timeout=SERVICE_RETRY)
+            except (OSError, ValueError):   # not started yet, or a stale file
+                if self._start_service:
+                    try:
+                        self._start_service()
+                    except Exception as exc:
+                        log(f"Cannot start the download service: {exc}", "ERR")
+                time.sleep(SERVICE_RETRY)
+                continue
+            try:
+                self._converse(sock, token)
+            except (OSError, ValueError) as exc:
+                log(f"Download service connection lost: {exc}", "WARN")
+            finally:
+                with self._lock:
+                    self._sock = None
+                sock.close()
+            time.sleep(SERVICE_RETRY)
+
+    def _converse(self, sock: socket.socket, token: str):
+        sock.settimeout(None)
+        hello = json.dumps({"cmd": "hello", "token": token}) + "\n"
+        with self._lock:
+            sock.sendall(hello.encode("utf-8"))
+            for line in self._outbox:
+                sock.sendall(line)
+            self._outbox.clear()
+            self._sock = sock
+        with sock.makefile("r", encoding="utf-8") as lines:
+            for line in lines:
+                self._handle(json.loads(line))
+
+    def _handle(self, msg: dict):
+        event = msg.get("event")
+        if event == "session":
+            if self._session is not None and msg["id"] != self._session:
+                log("Download service restarted; reloading its jobs", "WARN")
+                self.jobs.clear()
+                if self.on_reset:
+                    self.on_reset()
+            self._session = msg["id"]
+        elif event == "job":
+            snap = msg["job"]
+            job  = self.jobs.get(snap["id"])
+            if job is None:
+                job    = DownloadJob(snap["url"])
+                job.id = snap["id"]
+                parent = self.jobs.get(snap.get("parent"))
+                if parent is not None:
+                    job.parent = parent
+                    parent.children.append(job)
+                self.jobs[job.id] = job
+            for key in _SNAPSHOT_FIELDS:
+                setattr(job, key, snap.get(key, getattr(job, key)))
+            if self.on_change:
+                self.on_change(job)
+        elif event == "history" and self.on_history:
+            self.on_history(msg["record"])
+        elif event == "removed":
+            for job_id in msg.get("jobs", ()):
+                self.jobs.pop(job_id, None)
+
+
+# ─────────────────────────────────────────────
+#  BATCH MODE (headless CLI)
+# ─────────────────────────────────────────────
+def _iter_urls(source: str):
+    """Yield URLs from a file (or stdin for "-"), one per line, lazily."""
+    stream = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    try:
+        for line in stream:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def run_batch(argv: Optional[list] = None) -> int:
+    """
+    `python main.py --batch urls.txt --jobs N`
+
+    Prints one JSON object per line on stdout — "progress" events while
+    jobs run, a "result" per URL (exit 0 = saved, 1 = failed, with its
+    JobMetrics record) and a final "summary". A playlist / channel /
+    profile URL emits a "collection" line and then one result per entry. Logs go to stderr.
+    Returns 0 only if every URL succeeded.
+    """
+    parser = argparse.ArgumentParser(
+        prog="main.py --batch",
+        description="Download URLs without the UI.",
+    )
+    parser.add_argument("--batch", metavar="FILE", required=True,
+                        help="file with one URL per line, or - for stdin")
+    parser.add_argument("--jobs", type=int, default=MAX_CONCURRENT_DOWNLOADS,
+                        help=f"parallel downloads (default {MAX_CONCURRENT_DOWNLOADS})")
+    parser.add_argument("--output", metavar="DIR",
+                        help="save directory (default: ./downloads)")
+    parser.add_argument("--quality", metavar="POLICY", type=FormatPolicy,
+                        default=FormatPolicy(DEFAULT_QUALITY),
+                        help="best | 720p (max height) | 50M (max size) | "
+                             "60s (target download time); default: best")
+    parser.add_argument("--limit-rate", metavar="RATE", type=parse_rate,
+                        default=BANDWIDTH_GLOBAL_LIMIT,
+                        help="total bandwidth cap, e.g. 2M or 500K (default: unlimited)")
+    parser.add_argument("--job-rate", metavar="RATE", type=parse_rate,
+                        default=BANDWIDTH_JOB_LIMIT,
+                        help="bandwidth cap per download (default: unlimited)")
+    args = parser.parse_args(argv)
+
+    set_log_stream(sys.stderr)
+    out_lock = threading.Lock()
+    results  = {}
+    backlog  = threading.Semaphore(max(1, args.jobs) * 2)   # bounded read-ahead
+    reported = {}   # job id → last (state, progress) printed
+
+    def emit(event: dict):
+        with out_lock:
+            sys.stdout.write(json.dumps(event, ensure_ascii=False) + "\n")
+            sys.stdout.flush()
+
+    def report(jobs: list):
+        for job in jobs:
+            snapshot = (job.state, job.progress)
+            if reported.get(job.id) == snapshot:
+                continue
+            reported[job.id] = snapshot
+            emit({
+                "event":      "progress",
+                "job":        job.id,
+                "url":        job.url,
+                "state":      job.state,
+                "progress":   job.progress,
+                "downloaded": job.downloaded,
+                "total":      job.total_bytes,
+                "speed":      round(job.speed),
+                "message":    job.message,
+            })
+
+    progress = ProgressAggregator(report)
+
+    engine = DownloadEngine(
+        args.output, BandwidthScheduler(args.limit_rate, args.job_rate), args.quality.spec
+    )
+
+    def handler(job: DownloadJob):
+        try:
+            engine.run(job)
+        finally:
+            report([job])   # final progress line precedes the result
+            if job.children:
+                # Collection: its entries are queued and report their own results
+                emit({"event": "collection", "job": job.id, "url": job.url,
+                      "title": job.title, "entries": len(job.children)})
+            else:
+                ok = job.state == JOB_DONE
+                results[job.id] = ok
+                emit({
+                    "event":      "result",
+                    "job":        job.id,
+                    "url":        job.url,
+                    "collection": job.parent.id if job.parent else None,
+                    "exit":       0 if ok else 1,
+                    "platform":   job.platform,
+                    "path":       job.filepath,
+                    "error":      job.error or ("" if ok else job.message),
+                    "metrics":    job.metrics.to_record(job) if job.metrics else None,
+                })
+            if job.parent is None:
+                backlog.release()   # entries never took a backlog slot
+
+    dl_queue = DownloadQueue(handler, workers=args.jobs, on_change=progress.push)
+    engine.submit_many = dl_queue.submit_many
+    progress.start()
+    try:
+        for url in _iter_urls(args.batch):
+            backlog.acquire()
+            dl_queue.submit(url)
+        dl_queue.join()
+    except OSError as exc:
+        log(f"Cannot read URL list: {exc}", "ERR")
+        return 2
+    except KeyboardInterrupt:
+        # Pause rather than abandon: partial data stays for the next run
+        log("Interrupted — pausing jobs", "WARN")
+        for job in list(dl_queue.jobs.values()):
+            dl_queue.pause(job.id)
+        dl_queue.join()
+    progress.stop()
+
+    ok = sum(1 for v in results.values() if v)
+    emit({"event": "summary", "total": len(results), "ok": ok, "failed": len(results) - ok,
+          "extractors": EXTRACTORS.stats()})
+    return 0 if ok == len(results) else 1
@@ -6,108 +6,74 @@
   
 """
 
-import os
-import json
-import threading
+import sys
 import time
-import re
-from functools import partial
-from typing import Optional
-import requests
-import yt_dlp
-from datetime import datetime
+
+_T0 = time.perf_counter()   # cold-start reference point
+
+if __name__ == "__main__" and any(
+        arg == "--batch" or arg.startswith("--batch=") for arg in sys.argv[1:]):
+    # Headless batch mode — runs the engine without importing Kivy
+    from engine import run_batch
+    sys.exit(run_batch(sys.argv[1:]))
+
+from collections import OrderedDict
 from kivy.lang import Builder
 from kivy.utils import platform
-from kivy.clock import mainthread
-from kivy.core.clipboard import Clipboard
+from kivy.clock import Clock, mainthread
 from kivy.core.window import Window
 from kivy.metrics import dp
-from kivy.uix.widget import Widget
+from kivy.properties import (
+    BooleanProperty, ListProperty, NumericProperty, ObjectProperty, StringProperty,
+)
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 from kivymd.app import MDApp
 from kivymd.uix.screen import MDScreen
-from kivymd.uix.snackbar import Snackbar
 from kivymd.uix.card import MDCard
-from kivymd.uix.button import MDRectangleFlatIconButton, MDFlatButton, MDRaisedButton
-from kivymd.uix.label import MDLabel, MDIcon
-from kivymd.uix.boxlayout import MDBoxLayout
-from kivymd.uix.chip import MDChip, MDChipText
+# Other KivyMD widgets (chips, buttons, snackbar…) are resolved through
+# kivymd's Factory registrations when first used, not imported up front.
+from engine import (
+    APP_VERSION, DEFAULT_QUALITY, QUALITY_PRESETS,
+    JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED, JOB_CANCELLED, JOB_PAUSED,
+    SERVICE_NAME,
+    DownloadEngine, DownloadJob, DownloadQueue, FormatPolicy, HistoryManager, JobJournal,
+    MetricsLog, ProgressAggregator, QueueClient, StartupTimer, extract_urls, format_bytes, log,
+    normalize_url, warm_up,
+)
+
+STARTUP = StartupTimer(_T0)
+STARTUP.mark("imports")
 
 # ─────────────────────────────────────────────
 #  CONSTANTS
 # ─────────────────────────────────────────────
-APP_VERSION  = "1.0.3"
-HISTORY_FILE = "download_history.json"
-MAX_HISTORY  = 50
-CHUNK_SIZE   = 131072  # 128 KB – faster downloads
-
-# Shared browser-like User-Agent (works on phone AND headless server)
-USER_AGENT = (
-    "Mozilla/5.0 (Linux; Android 13; Pixel 7) "
-    "AppleWebKit/537.36 (KHTML, like Gecko) "
-    "Chrome/120.0.0.0 Mobile Safari/537.36"
-)
+HISTORY_PAGE_SIZE = 40    # rows fetched per History screen page
+INTENT_SEEN_MAX   = 256   # shared links remembered to skip repeated shares
+INTENT_ACTIONS    = ("android.intent.action.SEND", "android.intent.action.SEND_MULTIPLE")
 
-# ─────────────────────────────────────────────
-#  LOGGER
-# ─────────────────────────────────────────────
-def log(msg: str, level: str = "INFO"):
-    ts  = datetime.now().strftime("%H:%M:%S")
-    tag = {"INFO": "ℹ", "OK": "✓", "WARN": "⚠", "ERR": "✗"}.get(level, "•")
-    print(f"[{ts}] {tag}  {msg}")
 
+def show_snack(text: str):
+    from kivymd.uix.snackbar import Snackbar
+    Snackbar(text=text).open()
 
-# ─────────────────────────────────────────────
-#  HISTORY MANAGER
-# ─────────────────────────────────────────────
-class HistoryManager:
-    @staticmethod
-    def _load() -> list:
-        try:
-            if os.path.exists(HISTORY_FILE):
-                with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-                    return json.load(f)
-        except Exception:
-            pass
-        return []
 
-    @staticmethod
-    def _save(data: list):
-        try:
-            with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-                json.dump(data[-MAX_HISTORY:], f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            log(f"History save error: {e}", "ERR")
-
-    @classmethod
-    def add(cls, url: str, plat: str, filepath: str, success: bool):
-        data = cls._load()
-        data.append({
-            "url":       url,
-            "platform":  plat,
-            "filepath":  filepath,
-            "success":   success,
-            "timestamp": datetime.now().strftime("%d.%m.%Y %H:%M"),
-        })
-        cls._save(data)
-
-    @classmethod
-    def get_all(cls) -> list:
-        return cls._load()
-
-    @classmethod
-    def clear(cls):
-        cls._save([])
+def start_download_service():
+    """(Re)start the Android download service (service.py); a no-op while it runs."""
+    from jnius import autoclass  # type: ignore
+    activity = autoclass("org.kivy.android.PythonActivity").mActivity
+    service  = autoclass(f"{activity.getPackageName()}.Service{SERVICE_NAME}")
+    service.start(activity, "")
 
 # ─────────────────────────────────────────────
 #  KV LAYOUT
 # ─────────────────────────────────────────────
+# Only the Home screen (and its job rows) is parsed at launch. The other
+# screens' rules live in SCREEN_KV and are loaded on first navigation —
+# see ProDownloaderApp.ensure_screen().
 KV = """
 MDScreenManager:
     id: screen_manager
     HomeScreen:
-    HistoryScreen:
-    RulesScreen:
-    AboutScreen:
 
 # ════════════════════════════════════════════
 #  HOME SCREEN
@@ -140,6 +106,12 @@ MDScreenManager:
                 text_color: 0.55, 0.55, 0.65, 1
                 on_release: root.go_screen("history")
 
+            MDIconButton:
+                icon: "chart-line"
+                theme_text_color: "Custom"
+                text_color: 0.55, 0.55, 0.65, 1
+                on_release: root.go_screen("stats")
+
             MDIconButton:
                 icon: "shield-check-outline"
                 theme_text_color: "Custom"
@@ -236,15 +208,13 @@ MDScreenManager:
                             width: "48dp"
                             on_release: root.paste_from_clipboard()
 
-                # Status + progress card
+                # Status card (queue summary / hints)
                 MDCard:
                     size_hint_y: None
-                    height: "96dp"
+                    height: "56dp"
                     padding: "16dp", "14dp"
-                    spacing: "10dp"
                     md_bg_color: 0.07, 0.07, 0.12, 1
                     radius: [14,]
-                    orientation: "vertical"
 
                     MDLabel:
                         id: status_label
@@ -254,11 +224,16 @@ MDScreenManager:
                         text_color: 0.55, 0.6, 0.68, 1
                         font_size: "12.5sp"
 
-                    MDProgressBar:
-                        id: progress_bar
-                        value: 0
-                        opacity: 0
-                        color: 0.2, 1, 0.55, 1
+                # Quality policy toggle (tap to cycle QUALITY_PRESETS)
+                MDRectangleFlatIconButton:
+                    text: "Quality: " + root.quality_label
+                    icon: "quality-high"
+                    size_hint_x: 1
+                    theme_text_color: "Custom"
+                    text_color: 0.55, 0.6, 0.68, 1
+                    line_color: 0.2, 0.2, 0.28, 1
+                    icon_color: 0.2, 1, 0.55, 1
+                    on_release: root.cycle_quality()
 
                 # Download button
                 MDRaisedButton:
@@ -278,11 +253,72 @@ MDScreenManager:
                     text_color: 0.38, 0.38, 0.48, 1
                     on_release: root.clear_input()
 
+                # Download queue (one JobRow per job)
+                MDBoxLayout:
+                    id: jobs_list
+                    orientation: "vertical"
+                    spacing: "10dp"
+                    adaptive_height: True
+
                 Widget:
                     size_hint_y: None
                     height: "24dp"
 
 
+# ════════════════════════════════════════════
+#  DOWNLOAD JOB ROW
+# ════════════════════════════════════════════
+<JobRow>:
+    orientation: "vertical"
+    size_hint_y: None
+    height: "84dp"
+    padding: "14dp", "6dp", "6dp", "10dp"
+    spacing: "4dp"
+    md_bg_color: 0.08, 0.08, 0.14, 1
+    radius: [12,]
+
+    MDBoxLayout:
+        orientation: "horizontal"
+        size_hint_y: None
+        height: "32dp"
+
+        MDLabel:
+            text: root.title_text
+            bold: True
+            theme_text_color: "Custom"
+            text_color: 0.88, 0.9, 0.93, 1
+            font_size: "13sp"
+            shorten: True
+
+        MDIconButton:
+            icon: "play" if root.paused else "pause"
+            disabled: not root.active
+            opacity: 1 if root.active else 0
+            theme_text_color: "Custom"
+            text_color: 0.55, 0.55, 0.65, 1
+            on_release: root.toggle_pause()
+
+        MDIconButton:
+            icon: "close"
+            disabled: not root.active
+            opacity: 1 if root.active else 0
+            theme_text_color: "Custom"
+            text_color: 0.85, 0.3, 0.3, 1
+            on_release: root.cancel()
+
+    MDLabel:
+        text: root.status_text
+        theme_text_color: "Custom"
+        text_color: 0.52, 0.56, 0.64, 1
+        font_size: "12sp"
+        shorten: True
+
+    MDProgressBar:
+        value: root.progress
+        color: root.bar_color
+"""
+
+HISTORY_KV = """
 # ════════════════════════════════════════════
 #  HISTORY SCREEN
 # ════════════════════════════════════════════
@@ -318,53 +354,106 @@ MDScreenManager:
                 text_color: 0.85, 0.3, 0.3, 1
                 on_release: root.clear_history()
 
-        MDScrollView:
-            MDBoxLayout:
+        MDBoxLayout:
+            id: empty_box
+            orientation: "vertical"
+            size_hint_y: None
+            height: "220dp"
+            padding: "0dp", "40dp"
+
+            Widget:
+
+            MDIcon:
+                icon: "download-off-outline"
+                halign: "center"
+                theme_text_color: "Custom"
+                text_color: 0.22, 0.22, 0.32, 1
+                font_size: "52sp"
+                size_hint_y: None
+                height: "60dp"
+
+            MDLabel:
+                id: empty_label
+                text: "No downloads yet."
+                halign: "center"
+                theme_text_color: "Custom"
+                text_color: 0.32, 0.32, 0.42, 1
+                size_hint_y: None
+                height: "36dp"
+
+            Widget:
+
+        # Recycled list — only on-screen rows exist as widgets
+        RecycleView:
+            id: history_rv
+            viewclass: "HistoryRow"
+            bar_width: "4dp"
+            on_scroll_y: root.on_history_scroll(self.scroll_y)
+
+            RecycleBoxLayout:
                 orientation: "vertical"
+                default_size: None, dp(118)
+                default_size_hint: 1, None
+                size_hint_y: None
+                height: self.minimum_height
                 padding: "14dp"
                 spacing: "12dp"
-                adaptive_height: True
 
-                MDBoxLayout:
-                    id: empty_box
-                    orientation: "vertical"
-                    size_hint_y: None
-                    height: "220dp"
-                    padding: "0dp", "40dp"
 
-                    Widget:
+# ════════════════════════════════════════════
+#  HISTORY ROW (RecycleView item)
+# ════════════════════════════════════════════
+<HistoryRow>:
+    orientation: "vertical"
+    padding: "14dp", "12dp"
+    spacing: "8dp"
+    md_bg_color: 0.08, 0.08, 0.14, 1
+    radius: [12,]
 
-                    MDIcon:
-                        icon: "download-off-outline"
-                        halign: "center"
-                        theme_text_color: "Custom"
-                        text_color: 0.22, 0.22, 0.32, 1
-                        font_size: "52sp"
-                        size_hint_y: None
-                        height: "60dp"
+    MDBoxLayout:
+        orientation: "horizontal"
+        size_hint_y: None
+        height: "24dp"
+        spacing: "8dp"
 
-                    MDLabel:
-                        id: empty_label
-                        text: "No downloads yet."
-                        halign: "center"
-                        theme_text_color: "Custom"
-                        text_color: 0.32, 0.32, 0.42, 1
-                        size_hint_y: None
-                        height: "36dp"
+        MDIcon:
+            icon: root.icon_name
+            theme_text_color: "Custom"
+            text_color: 0.2, 1, 0.55, 1
+            size_hint_x: None
+            width: "24dp"
 
-                    Widget:
+        MDLabel:
+            text: root.title_text
+            bold: True
+            theme_text_color: "Custom"
+            text_color: 0.88, 0.9, 0.93, 1
+            shorten: True
 
-                MDBoxLayout:
-                    id: history_list
-                    orientation: "vertical"
-                    spacing: "12dp"
-                    adaptive_height: True
+    MDLabel:
+        text: root.detail_text
+        theme_text_color: "Custom"
+        text_color: 0.52, 0.56, 0.64, 1
+        font_size: "12sp"
+        shorten: True
 
-                Widget:
-                    size_hint_y: None
-                    height: "24dp"
+    MDBoxLayout:
+        orientation: "horizontal"
+        size_hint_y: None
+        height: "40dp"
+        spacing: "12dp"
 
+        Widget:
 
+        MDRectangleFlatIconButton:
+            text: "Re-download"
+            icon: "download"
+            size_hint_x: None
+            width: "170dp"
+            on_release: root.retry()
+"""
+
+RULES_KV = """
 # ════════════════════════════════════════════
 #  RULES SCREEN
 # ════════════════════════════════════════════
@@ -441,6 +530,51 @@ MDScreenManager:
                     height: "20dp"
 
 
+# ════════════════════════════════════════════
+#  REUSABLE RULE CARD
+# ════════════════════════════════════════════
+<RuleCard@MDCard>:
+    icon_text:  "information"
+    title_text: "Title"
+    body_text:  "Body"
+    orientation: "vertical"
+    size_hint_y: None
+    height: self.minimum_height
+    padding: "16dp"
+    spacing: "8dp"
+    md_bg_color: 0.07, 0.07, 0.12, 1
+    radius: [12,]
+
+    MDBoxLayout:
+        orientation: "horizontal"
+        size_hint_y: None
+        height: "32dp"
+        spacing: "10dp"
+
+        MDIcon:
+            icon: root.icon_text
+            theme_text_color: "Custom"
+            text_color: 0.2, 1, 0.55, 1
+            size_hint_x: None
+            width: "28dp"
+
+        MDLabel:
+            text: root.title_text
+            font_style: "Subtitle1"
+            bold: True
+            theme_text_color: "Custom"
+            text_color: 0.88, 0.9, 0.93, 1
+
+    MDLabel:
+        text: root.body_text
+        theme_text_color: "Custom"
+        text_color: 0.52, 0.56, 0.64, 1
+        font_size: "13sp"
+        size_hint_y: None
+        height: self.texture_size[1] + 8
+"""
+
+ABOUT_KV = """
 # ════════════════════════════════════════════
 #  ABOUT SCREEN
 # ════════════════════════════════════════════
@@ -648,70 +782,169 @@ MDScreenManager:
                 Widget:
                     size_hint_y: None
                     height: "24dp"
+"""
+
+STATS_KV = """
+# ════════════════════════════════════════════
+#  STATS SCREEN
+# ════════════════════════════════════════════
+<StatsScreen>:
+    name: "stats"
+    MDBoxLayout:
+        orientation: "vertical"
+        md_bg_color: 0.04, 0.04, 0.07, 1
+
+        MDBoxLayout:
+            orientation: "horizontal"
+            size_hint_y: None
+            height: "56dp"
+            padding: "4dp", "8dp"
+            md_bg_color: 0.07, 0.07, 0.12, 1
+
+            MDIconButton:
+                icon: "arrow-left"
+                theme_text_color: "Custom"
+                text_color: 0.55, 0.55, 0.65, 1
+                on_release: root.go_back()
+
+            MDLabel:
+                text: "Download Stats"
+                font_style: "H6"
+                bold: True
+                theme_text_color: "Custom"
+                text_color: 0.2, 1, 0.55, 1
+
+            MDIconButton:
+                icon: "refresh"
+                theme_text_color: "Custom"
+                text_color: 0.55, 0.55, 0.65, 1
+                on_release: root.load_stats()
+
+        MDScrollView:
+            MDBoxLayout:
+                id: stats_list
+                orientation: "vertical"
+                padding: "14dp"
+                spacing: "12dp"
+                adaptive_height: True
+
+                MDLabel:
+                    id: empty_label
+                    text: "No downloads measured yet."
+                    halign: "center"
+                    theme_text_color: "Custom"
+                    text_color: 0.32, 0.32, 0.42, 1
+                    size_hint_y: None
+                    height: "60dp"
 
 
 # ════════════════════════════════════════════
-#  REUSABLE RULE CARD
+#  STAT CARD (one app version + platform)
 # ════════════════════════════════════════════
-<RuleCard@MDCard>:
-    icon_text:  "information"
-    title_text: "Title"
-    body_text:  "Body"
+<StatCard>:
     orientation: "vertical"
     size_hint_y: None
     height: self.minimum_height
-    padding: "16dp"
-    spacing: "8dp"
-    md_bg_color: 0.07, 0.07, 0.12, 1
+    padding: "14dp", "12dp"
+    spacing: "6dp"
+    md_bg_color: 0.08, 0.08, 0.14, 1
     radius: [12,]
 
-    MDBoxLayout:
-        orientation: "horizontal"
+    MDLabel:
+        text: root.title_text
+        bold: True
+        theme_text_color: "Custom"
+        text_color: 0.88, 0.9, 0.93, 1
         size_hint_y: None
-        height: "32dp"
-        spacing: "10dp"
-
-        MDIcon:
-            icon: root.icon_text
-            theme_text_color: "Custom"
-            text_color: 0.2, 1, 0.55, 1
-            size_hint_x: None
-            width: "28dp"
-
-        MDLabel:
-            text: root.title_text
-            font_style: "Subtitle1"
-            bold: True
-            theme_text_color: "Custom"
-            text_color: 0.88, 0.9, 0.93, 1
+        height: "24dp"
 
     MDLabel:
         text: root.body_text
         theme_text_color: "Custom"
         text_color: 0.52, 0.56, 0.64, 1
-        font_size: "13sp"
+        font_size: "12sp"
         size_hint_y: None
-        height: self.texture_size[1] + 8
+        height: self.texture_size[1]
 """
 
+SCREEN_KV = {
+    "history": HISTORY_KV,
+    "stats":   STATS_KV,
+    "rules":   RULES_KV,
+    "about":   ABOUT_KV,
+}
+
 
 # ─────────────────────────────────────────────
 #  HOME SCREEN
 # ─────────────────────────────────────────────
+class JobRow(MDCard):
+    """One row of the download queue on the Home screen."""
+    job_id      = NumericProperty(0)
+    title_text  = StringProperty("")
+    status_text = StringProperty("")
+    progress    = NumericProperty(0)
+    bar_color   = ListProperty([0.2, 1, 0.55, 1])
+    active      = BooleanProperty(True)    # not finished → controls shown
+    paused      = BooleanProperty(False)
+
+    def toggle_pause(self):
+        MDApp.get_running_app().root.get_screen("home").toggle_pause(self.job_id)
+
+    def cancel(self):
+        MDApp.get_running_app().root.get_screen("home").cancel_job(self.job_id)
+
+
 class HomeScreen(MDScreen):
 
+    BAR_COLORS = {
+        JOB_FAILED:    (1, 0.3, 0.3, 1),
+        JOB_CANCELLED: (0.38, 0.38, 0.48, 1),
+        JOB_PAUSED:    (0.95, 0.75, 0.25, 1),
+    }
+
+    quality       = StringProperty(DEFAULT_QUALITY)   # FormatPolicy spec for new jobs
+    quality_label = StringProperty(FormatPolicy(DEFAULT_QUALITY).label)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.engine    = None   # only when downloads run in this process
+        # Workers only mark jobs dirty; rows are redrawn at PROGRESS_FLUSH_HZ
+        self.progress  = ProgressAggregator(self._render_jobs)
+        if platform == "android":
+            # Downloads run in the foreground service so they survive the
+            # activity going to the background; this is a mirror of its queue
+            self.queue = QueueClient(
+                on_change=self.progress.push, on_history=self._history_added,
+                on_reset=self._drop_rows, start_service=start_download_service,
+            )
+        else:
+            self.engine = DownloadEngine()
+            self.queue  = DownloadQueue(
+                self._worker, on_change=self.progress.push, journal=JobJournal()
+            )
+            self.engine.submit_many = self.queue.submit_many   # playlist / profile entries
+        self._job_rows = {}   # job id → JobRow
+        Clock.schedule_interval(self.progress.flush, self.progress.interval)
+
     # ── Navigation ────────────────────────────
     def go_screen(self, name: str):
+        screen = MDApp.get_running_app().ensure_screen(name)
         if name == "history":
-            self.manager.get_screen("history").load_history()
+            screen.ensure_loaded()
         self.manager.current = name
 
     def clear_input(self):
         self.ids.url_input.text = ""
+        for job in self.queue.clear_finished():
+            row = self._job_rows.pop(job.id, None)
+            if row is not None:
+                self.ids.jobs_list.remove_widget(row)
         self._reset_ui("Cleared. Ready for a new link.")
 
     def paste_from_clipboard(self):
         try:
+            from kivy.core.clipboard import Clipboard
             data = Clipboard.paste() or ""
         except Exception as exc:
             log(f"Clipboard paste failed: {exc}", "ERR")
@@ -734,18 +967,17 @@ class HomeScreen(MDScreen):
         self.ids.url_input.text = url
         self.start_download()
 
+    def cycle_quality(self):
+        presets = list(QUALITY_PRESETS)
+        index = presets.index(self.quality) if self.quality in presets else -1
+        self.quality = presets[(index + 1) % len(presets)]
+
+    def on_quality(self, _instance, spec: str):
+        self.quality_label = FormatPolicy(spec).label
+
     # ── Save path ─────────────────────────────
     def get_save_path(self) -> str:
-        if platform == "android":
-            from android.storage import primary_external_storage_path  # type: ignore
-            path = os.path.join(
-                primary_external_storage_path(), "Download", "ProDownloader"
-            )
-        else:
-            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "downloads")
-        os.makedirs(path, exist_ok=True)
-        log(f"Save path: {path}")
-        return path
+        return (self.engine or DownloadEngine()).get_save_path()
 
     # ── Download trigger ──────────────────────
     def start_download(self):
@@ -758,261 +990,109 @@ class HomeScreen(MDScreen):
             return
 
         log(f"Download requested: {url}")
-        self.ids.progress_bar.opacity = 1
-        self.ids.progress_bar.value   = 5
-        self.ids.progress_bar.color   = (0.2, 1, 0.55, 1)
-        self._set_status("Detecting platform…")
-
-        threading.Thread(
-            target=self._worker, args=(url,), daemon=True
-        ).start()
-
-    # ── Worker (background thread) ────────────
-    def _worker(self, url: str):
-        save_path     = self.get_save_path()
-        platform_name = "unknown"
-        filepath      = ""
-        success       = False
-
-        try:
-            if "tiktok.com" in url:
-                platform_name = "TikTok"
-                filepath = self._dl_tiktok(url, save_path)
-
-            elif any(x in url for x in ["youtube.com", "youtu.be"]):
-                platform_name = "YouTube"
-                filepath = self._dl_ytdlp(url, save_path, "YouTube")
-
-            elif "instagram.com" in url:
-                platform_name = "Instagram"
-                filepath = self._dl_ytdlp(url, save_path, "Instagram")
+        self.queue.submit(url, quality=self.quality)
+        self.ids.url_input.text = ""
 
-            else:
-                self._set_status("Unsupported platform!", error=True)
+    def resume_jobs(self):
+        """Re-queue jobs the previous run left unfinished (e.g. killed by Android)."""
+        if self.queue.journal is None:   # the download service restores its own
+            return
+        jobs = self.queue.restore(self.queue.journal.pending())
+        if jobs:
+            log(f"Resuming {len(jobs)} unfinished job(s) from the journal", "INFO")
+            self._show_snack(f"Resuming {len(jobs)} unfinished download(s)")
+
+    # ── Job controls ──────────────────────────
+    def toggle_pause(self, job_id: int):
+        job = self.queue.jobs.get(job_id)
+        if job is None:
+            return
+        if job.paused:
+            self.queue.resume(job_id)
+        else:
+            self.queue.pause(job_id)
+
+    def cancel_job(self, job_id: int):
+        if self.queue.cancel(job_id):
+            self._show_snack(f"Job #{job_id} cancelled")
+
+    # ── Worker (download pool thread) ─────────
+    def _worker(self, job: DownloadJob):
+        record = self.engine.run(job)
+        if record:
+            self._history_added(record)
+
+    # ── Job list (main thread, via ProgressAggregator) ──
+    def _render_jobs(self, jobs: list):
+        for job in jobs:
+            self._render_job(job)
+        self._refresh_summary()
+
+    def _render_job(self, job: DownloadJob):
+        if job.parent is not None:   # shown through its collection's row
+            return
+        row = self._job_rows.get(job.id)
+        if row is None:
+            if job.id not in self.queue.jobs:   # already cleared
                 return
+            row = JobRow(job_id=job.id)
+            self._job_rows[job.id] = row
+            self.ids.jobs_list.add_widget(row, index=len(self.ids.jobs_list.children))
+        kind = f"{job.platform} collection" if job.children else job.platform
+        row.title_text  = f"#{job.id}  {kind} — {job.state}"
+        row.status_text = job.message
+        row.progress    = max(0, min(100, job.progress))
+        row.bar_color   = self.BAR_COLORS.get(job.state, (0.2, 1, 0.55, 1))
+        row.active      = not job.finished
+        row.paused      = job.paused
 
-            # ── Final file check ──────────────
-            if filepath and os.path.exists(filepath) and os.path.getsize(filepath) > 0:
-                mb = os.path.getsize(filepath) / (1024 * 1024)
-                self._set_status(f"Done! Saved {mb:.1f} MB  ✓", success=True)
-                log(f"File ready: {filepath}  ({mb:.2f} MB)", "OK")
-                success = True
-            else:
-                self._set_status("File missing or empty!", error=True)
-                log("File not found after download", "ERR")
-
-        except Exception as exc:
-            log(f"Worker error: {exc}", "ERR")
-            self._set_status(f"Error: {str(exc)[:70]}", error=True)
-
-        finally:
-            HistoryManager.add(url, platform_name, filepath, success)
-
-    # ─────────────────────────────────────────
-    #  TikTok downloader (via yt-dlp)
-    # ─────────────────────────────────────────
-    def _dl_tiktok(self, url: str, save_path: str) -> str:
-        self._set_status("Fetching TikTok data…")
-        self._set_progress(20)
-        return self._dl_ytdlp(url, save_path, "TikTok")
-
-    # ─────────────────────────────────────────
-    #  YouTube & Instagram via yt-dlp
-    #  ─────────────────────────────────────────
-    #  KEY FIX: format="best[ext=mp4]/best"
-    #  ───────────────────────────────────────
-    #  "bestvideo+bestaudio" triggers a POST-PROCESS
-    #  merge step that requires ffmpeg.  If ffmpeg is
-    #  absent, yt-dlp's FileMergerPP tries to open the
-    #  output template string as a file object →
-    #  "'str' object has no attribute 'write'" crash.
-    #
-    #  "best[ext=mp4]/best" selects a single pre-muxed
-    #  stream — no merge, no ffmpeg, no crash.
-    # ─────────────────────────────────────────
-    def _dl_ytdlp(self, url: str, save_path: str, label: str) -> str:
-        self._set_status(f"Connecting to {label}…")
-        self._set_progress(15)
-
-        # Use %(id)s not %(title)s — titles can contain /:\\ etc.
-        out_tmpl = os.path.join(save_path, f"{label.lower()}_%(id)s.%(ext)s")
-
-        # Mutable container so inner closure can write the final path
-        # (avoids the 'nonlocal' scoping bug with str variables)
-        result = {"path": None}
-
-        def _hook(d: dict):
-            status = d.get("status", "")
-            if status == "downloading":
-                raw = d.get("_percent_str", "0%").strip().replace("%", "")
-                try:
-                    pct = float(raw)
-                    self._set_progress(15 + int(pct * 0.75))   # 15 → 90
-                    speed = d.get("_speed_str", "").strip()
-                    eta   = d.get("_eta_str",   "").strip()
-                    self._set_status(
-                        f"{label}: {pct:.0f}%  {speed}  ETA {eta}"
-                    )
-                except ValueError:
-                    pass
-            elif status == "finished":
-                path = d.get("filename") or d.get("info_dict", {}).get("_filename")
-                if path:
-                    result["path"] = str(path)
-                log(f"yt-dlp finished, hook path: {result['path']}", "INFO")
-
-        ydl_opts = {
-            "format": "best[ext=mp4]/best",
-            "outtmpl": out_tmpl,
-            "quiet": True,
-            "no_warnings": True,
-            "progress_hooks": [_hook],
-            "retries": 5,
-            "fragment_retries": 5,
-            "socket_timeout": 30,
-            "cookiefile": None,
-            "cookiesfrombrowser": None,
-            "nocheckcertificate": True,
-            "age_limit": 99,
-            "http_headers": {
-                "User-Agent": USER_AGENT,
-                "Accept-Language": "en-US,en;q=0.9",
-            },
-        }
-
-        before = set(os.listdir(save_path))
-
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            log(f"yt-dlp starting → {label}", "INFO")
-            ydl.download([url])
-
-        self._set_progress(93)
-
-        # ── Resolve actual output file ────────────────────────────────
-        # Priority 1: path captured by progress hook
-        if result["path"] and os.path.exists(result["path"]):
-            return result["path"]
-
-        # Priority 2: newest file added to the directory since we started
-        after = set(os.listdir(save_path))
-        new_files = [
-            os.path.join(save_path, f)
-            for f in (after - before)
-            if os.path.isfile(os.path.join(save_path, f))
-        ]
-        if new_files:
-            newest = max(new_files, key=os.path.getctime)
-            log(f"Resolved via dir-diff: {newest}", "INFO")
-            return newest
-
-        # Priority 3: any file in dir matching our label prefix
-        candidates = [
-            os.path.join(save_path, f)
-            for f in os.listdir(save_path)
-            if f.startswith(label.lower() + "_")
+    @mainthread
+    def _drop_rows(self):
+        """The download service restarted: its job ids start over."""
+        self.ids.jobs_list.clear_widgets()
+        self._job_rows.clear()
+
+    def _refresh_summary(self):
+        counts = self.queue.counts()
+        parts  = [
+            f"{counts[state]} {state}"
+            for state in (JOB_RUNNING, JOB_QUEUED, JOB_PAUSED, JOB_DONE, JOB_FAILED)
+            if counts.get(state)
         ]
-        if candidates:
-            return max(candidates, key=os.path.getctime)
-
-        # Last resort: return the template (caller will check existence)
-        return out_tmpl
-
-    # ─────────────────────────────────────────
-    #  Manual byte-stream download (fallback)
-    # ─────────────────────────────────────────
-    def _manual_download(self, url: str, path: str, base_progress: int = 20, progress_span: int = 70):
-        log(f"Manual download: {url[:65]}…", "INFO")
+        self.ids.status_label.text = "  ·  ".join(parts) or "System ready."
 
-        temp_path = path + ".part"
-        os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-
-        # Handle stale .part files with wrong permissions (e.g. from sudo runs)
-        if os.path.exists(temp_path) and not os.access(temp_path, os.W_OK):
-            try:
-                os.remove(temp_path)
-                log("Removed stale .part file (wrong permissions)", "WARN")
-            except OSError:
-                raise PermissionError(
-                    f"Cannot write to {os.path.basename(temp_path)}. "
-                    f"Run: sudo rm '{temp_path}'"
-                )
-
-        existing = os.path.getsize(temp_path) if os.path.exists(temp_path) else 0
-        headers = {"User-Agent": USER_AGENT}
-        if existing:
-            headers["Range"] = f"bytes={existing}-"
-            log(f"Resuming from byte {existing}", "INFO")
-
-        r = requests.get(url, stream=True, headers=headers, timeout=60)
-
-        if existing and r.status_code == 416:
-            os.replace(temp_path, path)
-            log("Partial file already complete (HTTP 416)", "OK")
-            return
-
-        if existing and r.status_code == 200:
-            # Server ignored byte range → start fresh
-            log("Server ignored Range header; restarting download", "WARN")
-            existing = 0
-            headers.pop("Range", None)
-            r.close()
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            r = requests.get(url, stream=True, headers=headers, timeout=60)
-
-        r.raise_for_status()
-
-        content_length = r.headers.get("content-length")
-        remainder = int(content_length) if content_length and content_length.isdigit() else 0
-        total = existing + remainder if remainder else 0
-
-        mode = "ab" if existing and r.status_code == 206 else "wb"
-        if mode == "wb" and os.path.exists(temp_path):
-            os.remove(temp_path)
-
-        done = existing
-        with open(temp_path, mode) as f:
-            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
-                if not chunk:
-                    continue
-                f.write(chunk)
-                done += len(chunk)
-                if total:
-                    pct = base_progress + int((done / total) * progress_span)
-                    self._set_progress(min(base_progress + progress_span, pct))
-
-        os.replace(temp_path, path)
-        log("Manual download complete", "OK")
+    @mainthread
+    def _history_added(self, record: dict):
+        if self.manager.has_screen("history"):   # not built yet → nothing to patch
+            self.manager.get_screen("history").prepend_record(record)
 
     @mainthread
-    def _set_status(self, text: str, success: bool = False, error: bool = False):
+    def _set_status(self, text: str):
         self.ids.status_label.text = text
-        if success:
-            self.ids.progress_bar.value = 100
-            self.ids.progress_bar.color = (0.2, 1, 0.55, 1)
-            self.ids.url_input.text     = ""
-        if error:
-            self.ids.progress_bar.color = (1, 0.3, 0.3, 1)
 
     @mainthread
     def _reset_ui(self, msg: str = "System ready."):
-        self.ids.status_label.text    = msg
-        self.ids.progress_bar.value   = 0
-        self.ids.progress_bar.opacity = 0
-        self.ids.progress_bar.color   = (0.2, 1, 0.55, 1)
-
-    @mainthread
-    def _set_progress(self, value: int):
-        self.ids.progress_bar.value = max(0, min(100, value))
+        self.ids.status_label.text = msg
 
     @mainthread
     def _show_snack(self, text: str):
-        Snackbar(text=text).open()
+        show_snack(text)
 
 
 # ─────────────────────────────────────────────
 #  HISTORY SCREEN
 # ─────────────────────────────────────────────
+class HistoryRow(RecycleDataViewBehavior, MDCard):
+    """Recycled history entry; fields come from HistoryScreen._row_data."""
+    title_text  = StringProperty("")
+    detail_text = StringProperty("")
+    icon_name   = StringProperty("download")
+    record      = ObjectProperty(None, allownone=True)
+
+    def retry(self):
+        MDApp.get_running_app().root.get_screen("history")._retry_download(self.record)
+
+
 class HistoryScreen(MDScreen):
 
     ICONS = {
@@ -1022,30 +1102,85 @@ class HistoryScreen(MDScreen):
         "unknown":   "download",
     }
 
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._loaded    = False
+        self._offset    = 0       # records fetched so far
+        self._exhausted = False   # no older records left
+        self._paging    = False   # a page was appended; wait for it to lay out
+        self._anchor    = 0.0     # px scrolled from the top when it was requested
+
     def go_back(self):
         self.manager.current = "home"
 
-    def load_history(self):
-        lst = self.ids.history_list
-        empty_box = self.ids.empty_box
-        lst.clear_widgets()
+    def ensure_loaded(self):
+        """Load the first page on first visit; later visits reuse the list."""
+        if not self._loaded:
+            self.load_history()
 
-        records = list(reversed(HistoryManager.get_all()))   # newest first
+    def load_history(self):
+        self._loaded    = True
+        self._offset    = 0
+        self._exhausted = False
+        self._end_paging()
+        self.ids.history_rv.data = []
+        self.ids.history_rv.scroll_y = 1
+        self._load_page()
+        self._update_empty()
+
+    def on_history_scroll(self, scroll_y: float):
+        # scroll_y is 1 at the top and 0 at the bottom
+        if self._loaded and not self._exhausted and not self._paging and scroll_y <= 0.05:
+            self._load_page(keep_position=True)
+
+    def prepend_record(self, record: dict):
+        """Show a just-finished download without rebuilding the list."""
+        if not self._loaded:
+            return
+        self.ids.history_rv.data.insert(0, self._row_data(record))
+        self._offset += 1
+        self._update_empty()
+
+    def _load_page(self, keep_position: bool = False):
+        records = HistoryManager.query(limit=HISTORY_PAGE_SIZE, offset=self._offset)
+        self._offset += len(records)
+        self._exhausted = len(records) < HISTORY_PAGE_SIZE
         if not records:
+            return
+        rv = self.ids.history_rv
+        if keep_position:
+            # scroll_y is a fraction, so appended rows would move the view
+            # to the new bottom (and load the next page). Pin the reader's
+            # pixel offset instead and hold further pages until it lands.
+            self._paging = True
+            self._anchor = (1 - rv.scroll_y) * max(rv.layout_manager.height - rv.height, 0)
+            rv.layout_manager.bind(height=self._restore_position)
+        rv.data.extend(self._row_data(rec) for rec in records)
+
+    def _restore_position(self, layout, height: float):
+        layout.unbind(height=self._restore_position)
+        rv = self.ids.history_rv
+        scrollable = height - rv.height
+        if scrollable > 0:
+            rv.scroll_y = max(0.0, 1 - self._anchor / scrollable)
+        Clock.schedule_once(self._end_paging, 0)   # next page no sooner than next frame
+
+    def _end_paging(self, *_args):
+        self.ids.history_rv.layout_manager.unbind(height=self._restore_position)
+        self._paging = False
+
+    def _update_empty(self):
+        empty_box = self.ids.empty_box
+        if self.ids.history_rv.data:
+            empty_box.opacity = 0
+            empty_box.height = 0
+        else:
             empty_box.opacity = 1
             empty_box.height = dp(220)
-            return
-
-        empty_box.opacity = 0
-        empty_box.height = 0
-        for rec in records:
-            lst.add_widget(self._build_history_card(rec))
 
-    def _build_history_card(self, record: dict) -> MDCard:
+    def _row_data(self, record: dict) -> dict:
         platform_name = record.get("platform", "unknown")
-        icon_name = self.ICONS.get(platform_name, "download")
         mark = "✓" if record.get("success") else "✗"
-        title_text = f"{mark}  {platform_name} — {record.get('timestamp', '')}"
 
         detail_text = record.get("filepath") or record.get("url", "")
         if detail_text and len(detail_text) > 80:
@@ -1053,81 +1188,25 @@ class HistoryScreen(MDScreen):
         if not detail_text:
             detail_text = "No file path stored."
 
-        card = MDCard(
-            orientation="vertical",
-            padding=(dp(14), dp(12), dp(14), dp(12)),
-            spacing=dp(8),
-            md_bg_color=(0.08, 0.08, 0.14, 1),
-            radius=[12],
-            size_hint=(1, None),
-        )
-        card.bind(minimum_height=card.setter("height"))
-
-        header = MDBoxLayout(
-            orientation="horizontal",
-            size_hint_y=None,
-            height=dp(24),
-            spacing=dp(8),
-        )
-        header.add_widget(MDIcon(
-            icon=icon_name,
-            theme_text_color="Custom",
-            text_color=(0.2, 1, 0.55, 1),
-            size_hint_x=None,
-            width=dp(24),
-        ))
-
-        title_label = MDLabel(
-            text=title_text,
-            bold=True,
-            theme_text_color="Custom",
-            text_color=(0.88, 0.9, 0.93, 1),
-            size_hint_y=None,
-        )
-        title_label.bind(texture_size=lambda inst, val: setattr(inst, "height", val[1]))
-        header.add_widget(title_label)
-
-        detail_label = MDLabel(
-            text=detail_text,
-            theme_text_color="Custom",
-            text_color=(0.52, 0.56, 0.64, 1),
-            font_size="12sp",
-            size_hint_y=None,
-        )
-        detail_label.bind(texture_size=lambda inst, val: setattr(inst, "height", val[1]))
-
-        action_row = MDBoxLayout(
-            orientation="horizontal",
-            size_hint_y=None,
-            height=dp(40),
-            spacing=dp(12),
-        )
-        action_row.add_widget(Widget())
-        retry_btn = MDRectangleFlatIconButton(
-            text="Re-download",
-            icon="download",
-        )
-        retry_btn.size_hint_x = None
-        retry_btn.width = dp(170)
-        retry_btn.bind(on_release=partial(self._retry_download, record))
-        action_row.add_widget(retry_btn)
-
-        card.add_widget(header)
-        card.add_widget(detail_label)
-        card.add_widget(action_row)
-        return card
+        return {
+            "title_text":  f"{mark}  {platform_name} — {record.get('timestamp', '')}",
+            "detail_text": detail_text,
+            "icon_name":   self.ICONS.get(platform_name, "download"),
+            "record":      record,
+        }
 
     def clear_history(self):
         HistoryManager.clear()
-        self.ids.history_list.clear_widgets()
-        self.ids.empty_box.opacity = 1
-        self.ids.empty_box.height = dp(220)
-        Snackbar(text="History cleared").open()
+        self._offset    = 0
+        self._exhausted = True
+        self.ids.history_rv.data = []
+        self._update_empty()
+        show_snack("History cleared")
 
     def _retry_download(self, record: dict, *_args):
         url = (record or {}).get("url", "")
         if not url:
-            Snackbar(text="No URL stored").open()
+            show_snack("No URL stored")
             return
 
         target = self.manager.get_screen("home")
@@ -1135,6 +1214,52 @@ class HistoryScreen(MDScreen):
         self.manager.current = "home"
 
 
+# ─────────────────────────────────────────────
+#  STATS SCREEN
+# ─────────────────────────────────────────────
+class StatCard(MDCard):
+    """Metrics summary for one (app version, platform) pair."""
+    title_text = StringProperty("")
+    body_text  = StringProperty("")
+
+
+class StatsScreen(MDScreen):
+
+    def go_back(self):
+        self.manager.current = "home"
+
+    def on_pre_enter(self, *_args):
+        self.load_stats()
+
+    def load_stats(self):
+        box = self.ids.stats_list
+        for card in [w for w in box.children if isinstance(w, StatCard)]:
+            box.remove_widget(card)
+        groups = MetricsLog.summary()
+        self.ids.empty_label.opacity = 0 if groups else 1
+        self.ids.empty_label.height  = 0 if groups else dp(60)
+        for group in groups:
+            box.add_widget(StatCard(
+                title_text=f"v{group['app_version']}  ·  {group['platform']}",
+                body_text=self._describe(group),
+            ))
+
+    @staticmethod
+    def _describe(g: dict) -> str:
+        def secs(value):
+            return f"{value:.2f} s" if value is not None else "—"
+
+        avg = g["median_avg_bps"]
+        return "\n".join((
+            f"{g['jobs']} jobs · {g['ok']} ok · {g['retries']} retries",
+            f"Extract {secs(g['median_extract_s'])} · TTFB {secs(g['median_ttfb_s'])} (median)",
+            f"Speed {format_bytes(avg) + '/s' if avg else '—'} median · "
+            f"{format_bytes(g['peak_bps'])}/s peak",
+            f"{format_bytes(g['bytes'])} fetched · {format_bytes(g['bytes_resumed'])} resumed",
+            f"Cache hits {g['cache_hits']} · already downloaded {g['dedup_hits']}",
+        ))
+
+
 # ─────────────────────────────────────────────
 #  RULES SCREEN
 # ─────────────────────────────────────────────
@@ -1156,9 +1281,15 @@ class AboutScreen(MDScreen):
 # ─────────────────────────────────────────────
 class ProDownloaderApp(MDApp):
 
-    _intent_processed = set()   # avoid processing the same share twice
+    SCREEN_CLASSES = {
+        "history": HistoryScreen,
+        "stats":   StatsScreen,
+        "rules":   RulesScreen,
+        "about":   AboutScreen,
+    }
 
     def build(self):
+        self._intent_seen = OrderedDict()   # normalized URL → True, LRU of shared links
         self.theme_cls.theme_style     = "Dark"
         self.theme_cls.primary_palette = "Green"
         self.title                     = "Pro Downloader"
@@ -1169,11 +1300,26 @@ class ProDownloaderApp(MDApp):
         if platform == "android":
             self._request_permissions()
 
-        return Builder.load_string(KV)
+        root = Builder.load_string(KV)
+        STARTUP.mark("build")
+        return root
+
+    def ensure_screen(self, name: str) -> MDScreen:
+        """Build a secondary screen (and parse its KV rules) on first use."""
+        if not self.root.has_screen(name):
+            t0 = time.perf_counter()
+            Builder.load_string(SCREEN_KV[name])
+            self.root.add_widget(self.SCREEN_CLASSES[name](name=name))
+            log(f"Built '{name}' screen in {(time.perf_counter() - t0) * 1000:.0f} ms")
+        return self.root.get_screen(name)
 
     # ── Android Share Intent ──────────────────
     def on_start(self):
         """Bind share-intent listener and process launch intent."""
+        Clock.schedule_once(self._first_frame, 0)
+        if platform != "android":   # on Android the download service warms itself
+            warm_up(on_ready=lambda: STARTUP.mark("engine ready"))
+        self.root.get_screen("home").resume_jobs()
         if platform == "android":
             try:
                 from android import activity as android_activity  # type: ignore
@@ -1183,6 +1329,11 @@ class ProDownloaderApp(MDApp):
             except Exception as e:
                 log(f"Intent setup error: {e}", "WARN")
 
+    @staticmethod
+    def _first_frame(*_args):
+        STARTUP.mark("first frame")
+        STARTUP.summary()
+
     def on_resume(self):
         """Re-check intent when app returns to foreground."""
         if platform == "android":
@@ -1193,62 +1344,62 @@ class ProDownloaderApp(MDApp):
                 pass
 
     def _handle_intent(self, intent):
-        """Process Android ACTION_SEND intent (share from other apps)."""
+        """Process Android ACTION_SEND / ACTION_SEND_MULTIPLE shares from other apps."""
         if intent is None:
             return
         try:
-            action = intent.getAction()
-            if action != "android.intent.action.SEND":
+            if intent.getAction() not in INTENT_ACTIONS:
                 return
             mime_type = intent.getType()
             if not mime_type or not mime_type.startswith("text/"):
                 return
-            extras = intent.getExtras()
-            if not extras:
-                return
-            shared_text = extras.getString("android.intent.extra.TEXT")
-            if not shared_text:
+            shared = self._shared_texts(intent)
+            if not shared:
                 return
-            # Avoid processing the same intent twice
-            intent_id = hash(shared_text)
-            if intent_id in self._intent_processed:
+
+            urls = extract_urls("\n".join(shared))
+            if not urls:
+                log(f"No valid URL in shared text: {shared[0][:60]}", "WARN")
                 return
-            self._intent_processed.add(intent_id)
-            if len(self._intent_processed) > 50:
-                self._intent_processed.clear()
-
-            url = self._extract_url(shared_text)
-            if url:
-                log(f"Share intent received: {url}", "INFO")
-                self._auto_download(url)
-            else:
-                log(f"No valid URL in shared text: {shared_text[:60]}", "WARN")
+            # Skip links already taken from an earlier share (on_resume
+            # re-delivers the launch intent, chat apps re-share lists)
+            fresh = []
+            for url in urls:
+                key = normalize_url(url)
+                if key in self._intent_seen:
+                    self._intent_seen.move_to_end(key)
+                    continue
+                self._intent_seen[key] = True
+                fresh.append(url)
+            while len(self._intent_seen) > INTENT_SEEN_MAX:
+                self._intent_seen.popitem(last=False)
+
+            if fresh:
+                log(f"Share intent received: {len(fresh)} link(s)", "INFO")
+                self._auto_download(fresh)
         except Exception as e:
             log(f"Intent handling error: {e}", "ERR")
 
     @staticmethod
-    def _extract_url(text: str) -> Optional[str]:
-        """Extract a supported video URL from shared text."""
-        urls = re.findall(r'https?://\S+', text)
-        supported = ("tiktok.com", "youtube.com", "youtu.be", "instagram.com")
-        for url in urls:
-            if any(domain in url for domain in supported):
-                return url.rstrip(".,;!?)")
-        return urls[0].rstrip(".,;!?)") if urls else None
+    def _shared_texts(intent) -> list:
+        """EXTRA_TEXT of a share: one string (SEND) or a list of them (SEND_MULTIPLE)."""
+        texts = intent.getCharSequenceArrayListExtra("android.intent.extra.TEXT")
+        if texts is not None:
+            return [str(texts.get(i)) for i in range(texts.size()) if texts.get(i)]
+        extras = intent.getExtras()
+        text = extras.getString("android.intent.extra.TEXT") if extras else None
+        return [text] if text else []
 
     @mainthread
-    def _auto_download(self, url: str):
-        """Auto-download video received from share intent."""
+    def _auto_download(self, urls: list):
+        """Queue every link from a share intent as its own job, with one snackbar."""
         home = self.root.get_screen("home")
         self.root.current = "home"
-        home.ids.url_input.text = url
-        home.start_download()
-        self._notify("Pro Downloader", f"Yüklənir: {url[:50]}…")
-
-    @staticmethod
-    def _notify(title: str, message: str):
-        """Log notification (plyer removed to reduce APK size)."""
-        log(f"Notification: {title} — {message}", "INFO")
+        for url in urls:
+            log(f"Download requested: {url}")
+        home.queue.submit_many(urls, quality=home.quality)
+        # Per-job progress shows in the list and the service's notification
+        show_snack(f"Queued {len(urls)} shared link{'s' if len(urls) != 1 else ''}")
 
     @staticmethod
     def _request_permissions():
@@ -1258,6 +1409,7 @@ class ProDownloaderApp(MDApp):
                 Permission.INTERNET,
                 Permission.WRITE_EXTERNAL_STORAGE,
                 Permission.READ_EXTERNAL_STORAGE,
+                "android.permission.POST_NOTIFICATIONS",   # API 33+: service progress
             ])
             log("Android permissions requested", "INFO")
         except Exception as e:
@@ -0,0 +1,188 @@
+"""
+=======================================================
+  PRO DOWNLOADER — Android download service
+  Declared in buildozer.spec as
+      services = Downloader:service.py:foreground
+  and started by main.py (start_download_service).
+
+  Owns the download queue, so transfers keep running when the
+  activity is backgrounded or killed and the screen turns off:
+  a partial wake lock and a high-performance Wi-Fi lock are held
+  while jobs run, and the ongoing notification shows progress.
+  The UI drives it through engine.QueueServer / QueueClient.
+
+  Without pyjnius (desktop) it runs headless — handy for testing
+  the UI ↔ service channel: `python service.py`.
+"""
+
+import threading
+import time
+from typing import Optional
+
+from engine import (
+    JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED,
+    DownloadEngine, DownloadJob, DownloadQueue, JobJournal, QueueServer,
+    format_bytes, log, warm_up,
+)
+
+# ─────────────────────────────────────────────
+#  CONSTANTS
+# ─────────────────────────────────────────────
+NOTIFICATION_ID      = 1            # p4a's foreground notification (first service → 1)
+NOTIFICATION_CHANNEL = "downloads"
+NOTIFY_INTERVAL      = 1.0          # s; Android drops faster notification updates
+IDLE_EXIT            = 120          # s idle with no UI connected → stop the service
+LOCK_TAG             = "prodownloader:downloads"
+
+
+# ─────────────────────────────────────────────
+#  ANDROID GLUE
+# ─────────────────────────────────────────────
+class ForegroundService:
+    """Progress notification, wake / Wi-Fi locks and stop() for the p4a service."""
+
+    def __init__(self):
+        from jnius import autoclass  # type: ignore
+
+        self._String  = autoclass("java.lang.String")
+        self._Builder = autoclass("android.app.Notification$Builder")
+        Context       = autoclass("android.content.Context")
+        Intent        = autoclass("android.content.Intent")
+        PendingIntent = autoclass("android.app.PendingIntent")
+        PowerManager  = autoclass("android.os.PowerManager")
+        WifiManager   = autoclass("android.net.wifi.WifiManager")
+
+        self.service = autoclass("org.kivy.android.PythonService").mService
+        self.sdk     = autoclass("android.os.Build$VERSION").SDK_INT
+        self.icon    = self.service.getApplicationInfo().icon
+        self.manager = self.service.getSystemService(Context.NOTIFICATION_SERVICE)
+        if self.sdk >= 26:
+            channel = autoclass("android.app.NotificationChannel")(
+                NOTIFICATION_CHANNEL, self._String("Downloads"),
+                autoclass("android.app.NotificationManager").IMPORTANCE_LOW,
+            )
+            self.manager.createNotificationChannel(channel)
+
+        # Tapping the notification brings the app back
+        intent = Intent(self.service, autoclass("org.kivy.android.PythonActivity"))
+        intent.setFlags(Intent.FLAG_ACTIVITY_SINGLE_TOP)
+        flags = PendingIntent.FLAG_IMMUTABLE if self.sdk >= 23 else 0
+        self.content = PendingIntent.getActivity(self.service, 0, intent, flags)
+
+        power = self.service.getSystemService(Context.POWER_SERVICE)
+        wifi  = self.service.getApplicationContext().getSystemService(Context.WIFI_SERVICE)
+        self.wake_lock = power.newWakeLock(PowerManager.PARTIAL_WAKE_LOCK, LOCK_TAG)
+        self.wifi_lock = wifi.createWifiLock(WifiManager.WIFI_MODE_FULL_HIGH_PERF, LOCK_TAG)
+        self.wake_lock.setReferenceCounted(False)
+        self.wifi_lock.setReferenceCounted(False)
+
+    def notify(self, title: str, text: str, percent: Optional[int] = None, ongoing: bool = True):
+        if self.sdk >= 26:
+            builder = self._Builder(self.service, NOTIFICATION_CHANNEL)
+        else:
+            builder = self._Builder(self.service)
+        builder.setSmallIcon(self.icon)
+        builder.setContentTitle(self._String(title))
+        builder.setContentText(self._String(text))
+        builder.setContentIntent(self.content)
+        builder.setOngoing(ongoing)
+        builder.setOnlyAlertOnce(True)
+        if percent is not None:
+            builder.setProgress(100, percent, percent < 0)
+        self.manager.notify(NOTIFICATION_ID, builder.build())
+
+    def hold_locks(self, busy: bool):
+        """Keep the CPU and Wi-Fi radio at full speed only while jobs run."""
+        for lock in (self.wake_lock, self.wifi_lock):
+            if busy and not lock.isHeld():
+                lock.acquire()
+            elif not busy and lock.isHeld():
+                lock.release()
+
+    def stop(self):
+        self.hold_locks(False)
+        self.service.stopForeground(True)
+        self.service.stopSelf()
+
+
+def describe(jobs: list) -> tuple:
+    """(title, text, percent or None, busy) for the notification."""
+    leaves = [job for job in jobs if not job.children]
+    active = [job for job in leaves if job.state in (JOB_RUNNING, JOB_QUEUED)]
+    if not active:
+        saved  = sum(1 for job in leaves if job.state == JOB_DONE)
+        failed = sum(1 for job in leaves if job.state == JOB_FAILED)
+        text   = f"{saved} saved" + (f", {failed} failed" if failed else "")
+        return "Downloads finished", text, None, False
+
+    running = [job for job in active if job.state == JOB_RUNNING]
+    done    = sum(job.downloaded for job in active)
+    total   = sum(job.total_bytes for job in active)
+    speed   = sum(job.speed for job in running)
+    percent = int(sum(job.progress for job in active) / len(active)) if running else -1
+    text    = format_bytes(done) + (f" of {format_bytes(total)}" if total else "")
+    if speed:
+        text += f"  ·  {format_bytes(speed)}/s"
+    queued  = len(active) - len(running)
+    title   = f"Downloading {len(running)} file(s)" + (f", {queued} queued" if queued else "")
+    return title, text, percent, True
+
+
+# ─────────────────────────────────────────────
+#  ENTRY POINT
+# ─────────────────────────────────────────────
+def main():
+    try:
+        android = ForegroundService()
+    except ImportError:
+        android = None
+        log("pyjnius not available — running the download service headless", "WARN")
+
+    engine = DownloadEngine()
+
+    def handler(job: DownloadJob):
+        record = engine.run(job)
+        if record:
+            server.history_added(record)
+
+    dl_queue = DownloadQueue(handler, journal=JobJournal())
+    try:
+        server = QueueServer(dl_queue)
+    except OSError as exc:
+        # Without its socket the UI can't reach the queue; say so and stop
+        # rather than leave the UI retrying against a silent service
+        log(f"Download service cannot listen: {exc}", "ERR")
+        if android:
+            android.notify("Download service failed", str(exc), ongoing=False)
+            android.stop()
+        return
+    dl_queue.on_change = server.job_changed
+    engine.submit_many = dl_queue.submit_many   # playlist / profile entries
+
+    warm_up()
+    jobs = dl_queue.restore(dl_queue.journal.pending())
+    if jobs:
+        log(f"Resuming {len(jobs)} unfinished job(s) from the journal", "INFO")
+    threading.Thread(target=server.serve_forever, name="queue-server", daemon=True).start()
+
+    idle_since = time.monotonic()
+    shown      = None
+    while True:
+        time.sleep(NOTIFY_INTERVAL)
+        state = describe(list(dl_queue.jobs.values()))
+        title, text, percent, busy = state
+        if android and state != shown:
+            android.notify(title, text, percent, ongoing=busy)
+            android.hold_locks(busy)
+            shown = state
+        if busy or server.clients:
+            idle_since = time.monotonic()
+        elif time.monotonic() - idle_since > IDLE_EXIT:
+            log("Download service idle — stopping", "INFO")
+            if android:
+                android.stop()
+            return
+
+
+if __name__ == "__main__":
+    main()